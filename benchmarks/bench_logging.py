@@ -0,0 +1,93 @@
+# benchmarks/bench_logging.py
+#
+# 比较下载热路径中逐条 print 与日志系统（普通 / 安静 / JSON）的耗时。
+# 模拟一个大用户：每张图片输出一条“正在下载”日志，每条动态输出保存元数据和内容文件的日志。
+# 逐张图片/逐条动态的日志为 DEBUG 级别，默认的 INFO 级别下在创建日志记录之前就被过滤掉；
+# "DEBUG" 一行展示开启这些日志时的开销。计时只覆盖热循环本身，另外记录写完所有日志的总耗时。
+# 每种模式在独立的子进程中运行，前一种模式的处理器和后台线程不会影响后面的测量。
+#
+# 用法: python benchmarks/bench_logging.py [动态数] [每条动态的图片数] > bench_output.txt
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from logger import get_logger, setup_logging, shutdown_logging
+
+logger = get_logger("bench")
+
+
+def hot_loop_print(total_posts: int, images_per_post: int):
+    """原来的实现：每条信息都同步 print，并带有 ANSI 颜色。"""
+    user_name = "bench_user"
+    for post in range(total_posts):
+        print(f"  - 正在保存动态 {post} 的步骤2元数据...")
+        for index in range(1, images_per_post + 1):
+            green_user_name = f"\033[92m{user_name}\033[0m"
+            print(f"  -  正在下载用户 {green_user_name} 图片: 2024-01-01_{post}_{index}.jpg")
+        print(f"  - 正在创建最终内容JSON文件: 2024-01-01_{post}.json")
+
+
+def hot_loop_logging(total_posts: int, images_per_post: int):
+    """新的实现：逐项信息为 DEBUG 级别的惰性日志调用，写出由后台线程完成。"""
+    user_name = "bench_user"
+    for post in range(total_posts):
+        logger.debug("  - 正在保存动态 %s 的步骤2元数据...", post, extra={"event": "save_metadata", "id_str": post})
+        for index in range(1, images_per_post + 1):
+            image_filename = f"2024-01-01_{post}_{index}.jpg"
+            logger.debug("  -  正在下载用户 %s 图片: %s", user_name, image_filename,
+                         extra={"event": "download", "user": user_name, "file": image_filename})
+        logger.debug("  - 正在创建最终内容JSON文件: %s", f"2024-01-01_{post}.json",
+                     extra={"event": "save_content", "id_str": post})
+
+
+def measure(label: str, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    loop_time = time.perf_counter() - start
+    shutdown_logging()
+    total_time = time.perf_counter() - start
+    sys.stderr.write(f"{label:<28} 热循环 {loop_time:8.3f}s   含写出 {total_time:8.3f}s\n")
+
+
+# 模式名 -> (显示名称, setup_logging 的参数；None 表示使用 print)
+MODES = {
+    "print": ("print（原实现）", None),
+    "text": ("logging text（默认 INFO）", {"log_format": "text"}),
+    "json": ("logging json", {"log_format": "json"}),
+    "quiet": ("logging quiet", {"quiet": True}),
+    "debug": ("logging text DEBUG", {"level": "DEBUG", "log_format": "text"}),
+}
+
+
+def run_mode(mode: str, total_posts: int, images_per_post: int):
+    """在当前进程中测量单个模式。"""
+    label, logging_kwargs = MODES[mode]
+    if logging_kwargs is None:
+        measure(label, hot_loop_print, total_posts, images_per_post)
+    else:
+        setup_logging(**logging_kwargs)
+        measure(label, hot_loop_logging, total_posts, images_per_post)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+        return
+
+    total_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    images_per_post = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sys.stderr.write(f"{total_posts} 条动态 x {images_per_post} 张图片，stdout -> {'终端' if sys.stdout.isatty() else '重定向'}\n")
+    sys.stderr.flush()
+
+    # 子进程继承本进程的 stdout/stderr，输出目标（终端或重定向）与直接运行时相同
+    for mode in MODES:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                        str(total_posts), str(images_per_post)], check=True)
+
+
+if __name__ == '__main__':
+    main()
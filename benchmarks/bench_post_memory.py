@@ -0,0 +1,150 @@
+# benchmarks/bench_post_memory.py
+#
+# 使用 tracemalloc 测量 PostHandler 处理一个拥有大量动态的用户时的内存占用。
+# 不访问网络也不写磁盘：gallery-dl 的输出由 FakeAPI 合成，图片下载由 FakeDownloader 模拟，
+# 步骤2元数据和内容 JSON 都不保存（两种模式相同，不影响对比）。
+# 依次运行两种模式，便于对比：
+#   baseline —— 原来的实现：下载期间一直持有完整的 images_data，失败的图片以字典记录；
+#   compact  —— 当前的实现：保存元数据后只保留 PostRecord，失败的图片以 PendingImage 记录。
+#
+# 用法: python benchmarks/bench_post_memory.py [动态数] [每条动态的图片数] [baseline|compact]
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from config import Config
+from processor.content_extractor import ContentExtractor
+from processor.downloader import Downloader
+from processor.metadata_saver import MetadataSaver
+from processor.post_handler import PostHandler
+
+
+class FakeAPI:
+    """
+    合成与 gallery-dl -j 输出结构相同的单个动态元数据，每张图片都重复完整的 detail。
+    与解析 gallery-dl 的输出一样经过一次 JSON 往返，每张图片持有各自独立的 detail 副本。
+    """
+
+    def __init__(self, images_per_post: int):
+        self.images_per_post = images_per_post
+
+    def get_post_metadata(self, post_url: str):
+        id_str = post_url.rsplit('/', 1)[-1]
+        detail = {
+            "id_str": id_str,
+            "modules": {
+                "module_author": {"name": "bench", "pub_ts": 1700000000 + int(id_str), "pub_time": "bench", "mid": 1},
+                "module_dynamic": {"desc": {"rich_text_nodes": [
+                    {"type": "RICH_TEXT_NODE_TYPE_TEXT", "text": "正文" * 200} for _ in range(20)
+                ]}},
+                "module_stat": {"like": {"count": 1}, "comment": {"count": 2}, "forward": {"count": 3}, "favorite": {"count": 4}},
+            },
+        }
+        images = [[2, {"url": post_url, "detail": detail}]]
+        for index in range(self.images_per_post):
+            images.append([3, f"https://i0.hdslb.com/bfs/new_dyn/{id_str}_{index}.jpg",
+                           {"url": f"https://i0.hdslb.com/bfs/new_dyn/{id_str}_{index}.jpg", "detail": detail}])
+        return json.loads(json.dumps(images, ensure_ascii=False))
+
+
+class FakeDownloader(Downloader):
+    """不访问网络，每 10 张图片中有 1 张“下载失败”，用于模拟失败列表的增长。"""
+
+    def download_image(self, url, folder, pub_ts, id_str, index, user_name, overwrite=False):
+        return "FAILED" if index % 10 == 0 else "SUCCESS"
+
+
+class NullSaver(MetadataSaver):
+    """不保存步骤2元数据。默认参数下真实的元数据约为每条动态 600 KB，总计约 3 GB。"""
+
+    def save_step2_metadata(self, images_data, user_folder, date_str, pub_ts, id_str):
+        pass
+
+
+class NullExtractor(ContentExtractor):
+    """不生成内容 JSON。"""
+
+    def create_content_json_from_local_meta(self, user_folder, date_str, id_str):
+        pass
+
+
+class BaselinePostHandler(PostHandler):
+    """重现精简记录之前的实现：下载期间一直持有 images_data，失败的图片以字典记录。"""
+
+    def process(self, user_name, post_url, user_folder, policy=None):
+        images_data = self.api.get_post_metadata(post_url)
+        detail = images_data[0][-1].get('detail', {})
+        id_str = detail.get('id_str')
+        pub_ts = detail.get('modules', {}).get('module_author', {}).get('pub_ts')
+        self.saver.save_step2_metadata(images_data, user_folder, "2023-11-14", pub_ts, id_str)
+
+        successful_downloads = 0
+        failed_downloads_info: List[Dict] = []
+        for index, image_info in enumerate(images_data[1:]):
+            if isinstance(image_info[-1], dict) and image_info[-1].get('url'):
+                download_args = {
+                    "url": image_info[-1]['url'],
+                    "folder": user_folder,
+                    "pub_ts": pub_ts,
+                    "id_str": id_str,
+                    "index": index + 1,
+                    "user_name": user_name
+                }
+                if self.downloader.download_image(**download_args) == "SUCCESS":
+                    successful_downloads += 1
+                else:
+                    failed_downloads_info.append(download_args)
+
+        self.extractor.create_content_json_from_local_meta(user_folder, "2023-11-14", id_str)
+        return True, successful_downloads, failed_downloads_info, []
+
+
+class BenchConfig(Config):
+    INCREMENTAL_DOWNLOAD = False
+
+
+HANDLERS = {
+    "baseline": BaselinePostHandler,
+    "compact": PostHandler,
+}
+
+
+def run_mode(mode: str, total_posts: int, images_per_post: int, user_folder: str):
+    handler = HANDLERS[mode](FakeAPI(images_per_post), BenchConfig(), NullExtractor(), FakeDownloader(), NullSaver())
+    checkpoint = max(total_posts // 10, 1)
+    session_failures = []
+
+    print(f"\n[{mode}]")
+    print(f"{'动态数':>8} {'当前内存(KiB)':>14} {'峰值内存(KiB)':>14} {'失败列表长度':>12}")
+    tracemalloc.start()
+    for post_index in range(1, total_posts + 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, _, failures, _ = handler.process("bench", f"https://www.bilibili.com/opus/{post_index}", user_folder)
+        session_failures.extend(failures)
+        if post_index % checkpoint == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{post_index:>8} {current / 1024:>14.1f} {peak / 1024:>14.1f} {len(session_failures):>12}")
+    tracemalloc.stop()
+
+
+def main():
+    total_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    images_per_post = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    modes = [sys.argv[3]] if len(sys.argv) > 3 else list(HANDLERS)
+
+    # 只用作路径，不会写入任何文件
+    with tempfile.TemporaryDirectory() as user_folder:
+        for mode in modes:
+            run_mode(mode, total_posts, images_per_post, user_folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 # api.py
 
+import asyncio
 import subprocess
 import json
 from typing import List, Dict, Any, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class BilibiliAPI:
     """一个用于通过 gallery-dl 工具与 Bilibili 交互的封装器。"""
@@ -14,25 +18,30 @@ class BilibiliAPI:
         """
         self.cookie_file = cookie_file
 
+    def _build_command(self, url: str) -> List[str]:
+        """构造 gallery-dl 命令行。"""
+        command = ['gallery-dl', '-j', url]
+        if self.cookie_file:
+            command.extend(['--cookies', self.cookie_file])
+        return command
+
     def _run_command(self, url: str) -> Optional[List[Dict[str, Any]]]:
         """
         一个集中的辅助函数，用于运行 gallery-dl 并解析其 JSON 输出。
         :param url: 要传递给 gallery-dl 的 URL。
         :return: 解析后的 JSON 数据，如果出错则返回 None。
         """
-        command = ['gallery-dl', '-j', url]
-        if self.cookie_file:
-            command.extend(['--cookies', self.cookie_file])
+        command = self._build_command(url)
         try:
             # 运行子进程，捕获输出，并使用 utf-8 编码
             result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
             return json.loads(result.stdout)
         except subprocess.CalledProcessError as e:
-            print(f"  - 错误: gallery-dl 执行失败，URL: {url}。错误输出: {e.stderr.strip()}")
+            logger.error(f"  - 错误: gallery-dl 执行失败，URL: {url}。错误输出: {e.stderr.strip()}")
         except json.JSONDecodeError:
-            print(f"  - 错误: 解析来自 gallery-dl 的 JSON 数据失败，URL: {url}。")
+            logger.error(f"  - 错误: 解析来自 gallery-dl 的 JSON 数据失败，URL: {url}。")
         except Exception as e:
-            print(f"  - 错误: 运行 gallery-dl 时发生未知错误: {e}")
+            logger.error(f"  - 错误: 运行 gallery-dl 时发生未知错误: {e}")
         return None
     
     def get_post_metadata(self, post_url: str) -> Optional[List[Dict[str, Any]]]:
@@ -49,4 +58,52 @@ class BilibiliAPI:
         :param user_url: 用户主页的 URL。
         :return: 包含元数据信息的列表，或在失败时返回 None。
         """
-        return self._run_command(user_url)
\ No newline at end of file
+        return self._run_command(user_url)
+
+
+class AsyncBilibiliAPI(BilibiliAPI):
+    """
+    BilibiliAPI 的异步版本：通过 asyncio.create_subprocess_exec 调用 gallery-dl，
+    并用信号量限制同时运行的 gallery-dl 进程数。
+    """
+
+    def __init__(self, cookie_file: Optional[str], max_concurrency: int):
+        """
+        :param cookie_file: 指向 cookies.txt 文件的路径，可以为 None。
+        :param max_concurrency: 同时运行的 gallery-dl 进程数上限。
+        """
+        super().__init__(cookie_file)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run_command_async(self, url: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        运行 gallery-dl 并解析其 JSON 输出，等待子进程期间不阻塞事件循环。
+        :param url: 要传递给 gallery-dl 的 URL。
+        :return: 解析后的 JSON 数据，如果出错则返回 None。
+        """
+        async with self._semaphore:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self._build_command(url), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await process.communicate()
+            except Exception as e:
+                logger.error(f"  - 错误: 运行 gallery-dl 时发生未知错误: {e}")
+                return None
+
+        if process.returncode != 0:
+            logger.error(f"  - 错误: gallery-dl 执行失败，URL: {url}。错误输出: {stderr.decode('utf-8', 'replace').strip()}")
+            return None
+        try:
+            return json.loads(stdout.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logger.error(f"  - 错误: 解析来自 gallery-dl 的 JSON 数据失败，URL: {url}。")
+        return None
+
+    async def get_post_metadata_async(self, post_url: str) -> Optional[List[Dict[str, Any]]]:
+        """异步获取单个动态的详细元数据。"""
+        return await self._run_command_async(post_url)
+
+    async def get_initial_metadata_async(self, user_url: str) -> Optional[List[Dict[str, Any]]]:
+        """异步获取用户主页的初始元数据转储。"""
+        return await self._run_command_async(user_url)
@@ -5,7 +5,12 @@ import sys
 import time
 import datetime
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple
+from logger import SUMMARY, get_logger
+
+logger = get_logger(__name__)
 
 @dataclass
 class LogEntry:
@@ -21,6 +26,9 @@ class LogEntry:
 
 from config import Config
 from api import BilibiliAPI
+from exporter import ArchiveExporter
+from user_folders import find_user_id, list_user_folders, resolve_user_folder
+from locking import LOCK_DIRNAME, FileLock, LockUnavailable, in_shard
 from processor.processor import PostProcessorFacade
 
 class Application:
@@ -32,8 +40,54 @@ class Application:
         self.api = BilibiliAPI(self.config.COOKIE_FILE_PATH)
         # 恢复：不再传递数据库实例
         self.processor = PostProcessorFacade(self.config.OUTPUT_DIR_PATH, self.api, self.config)
+        self.lock_dir = os.path.join(self.config.OUTPUT_DIR_PATH, LOCK_DIRNAME)
+
+    def _make_lock(self, name: str) -> FileLock:
+        return FileLock(self.lock_dir, name, self.config.LOCK_STALE_SECONDS)
+
+    def _get_pending_users_filepath(self, shard: Optional[Tuple[int, int]]) -> str:
+        """获取记录未处理用户的文件路径；每个分片使用独立的文件，互不覆盖。"""
+        suffix = f"_{shard[0]}of{shard[1]}" if shard else ""
+        return os.path.join(self.config.OUTPUT_DIR_PATH, f"pending_users{suffix}.json")
+
+    def _load_pending_users(self, shard: Optional[Tuple[int, int]]) -> List[int]:
+        """读取上次运行因预算用尽而未处理的用户ID列表。"""
+        pending_path = self._get_pending_users_filepath(shard)
+        if not os.path.exists(pending_path):
+            return []
+        try:
+            with open(pending_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"  - 警告：读取 '{os.path.basename(pending_path)}' 文件失败或格式错误: {e}")
+            return []
+
+    def _save_pending_users(self, shard: Optional[Tuple[int, int]], user_ids: List[int]):
+        """保存尚未处理的用户ID列表；列表为空时删除文件。"""
+        pending_path = self._get_pending_users_filepath(shard)
+        try:
+            if user_ids:
+                with open(pending_path, 'w', encoding='utf-8') as f:
+                    json.dump(user_ids, f, indent=4)
+            elif os.path.exists(pending_path):
+                os.remove(pending_path)
+        except (IOError, OSError) as e:
+            logger.error(f"  - 错误：更新 '{os.path.basename(pending_path)}' 文件失败: {e}")
 
     def _write_log(self, log_file_path: str, data: dict):
+        # 多个进程/主机可能同时追加日志，读-改-写期间需要持有锁
+        lock = self._make_lock("processing_time_log")
+        try:
+            lock.acquire(timeout=30)
+        except LockUnavailable as e:
+            logger.warning(f"  - 警告：无法获取日志文件锁，本条处理记录未写入: {e}")
+            return
+        try:
+            self._append_log_record(log_file_path, data)
+        finally:
+            lock.release()
+
+    def _append_log_record(self, log_file_path: str, data: dict):
         records = []
         if os.path.exists(log_file_path):
             try:
@@ -49,58 +103,231 @@ class Application:
         with open(log_file_path, 'w', encoding='utf-8') as f:
             json.dump(records, f, ensure_ascii=False, indent=4)
 
-    def run(self):
+    def export(self, users: Optional[List[str]] = None, export_format: Optional[str] = None):
+        """
+        将归档导出为每个用户一个列式数据集，只处理自上次导出以来发生变化的动态。
+        :param users: 要导出的用户文件夹名或数字ID列表，为 None 时导出所有用户。
+        :param export_format: 导出格式，为 None 时使用 config.EXPORT_FORMAT。
+        """
+        exporter = ArchiveExporter(self.config, export_format)
+        logger.info(f"正在导出归档（格式: {exporter.export_format}）到: {exporter.export_dir}")
+
+        if users:
+            folders = []
+            for user in users:
+                folder = resolve_user_folder(self.config.OUTPUT_DIR_PATH, self.config.USER_ID_TO_NAME_MAP, user)
+                if folder:
+                    folders.append(folder)
+                else:
+                    logger.warning(f"  - 警告：未找到用户 '{user}' 的文件夹，跳过。")
+        else:
+            folders = list_user_folders(self.config.OUTPUT_DIR_PATH)
+
+        start_time = time.perf_counter()
+        for folder in folders:
+            exporter.export_user(folder)
+        logger.log(SUMMARY, f"\n导出完成！共 {len(folders)} 个用户，耗时 {time.perf_counter() - start_time:.2f}s。")
+
+    def audit(self, users: Optional[List[str]] = None, repair: bool = False, download: bool = False,
+              workers: Optional[int] = None):
+        """
+        并行检查（并可选修复）多个用户文件夹的完整性，不需要重新获取任何元数据。
+        :param users: 要检查的用户文件夹名或数字ID列表，为 None 时检查所有用户文件夹。
+        :param repair: 是否修复发现的问题。
+        :param download: 修复后是否立即下载缺失的图片，必须与 repair 一起使用。
+        :param workers: 并行检查的线程数，为 None 时使用 config.AUDIT_WORKERS。
+        :raises ValueError: 指定了 download 但没有指定 repair。
+        """
+        if download and not repair:
+            raise ValueError("download 必须与 repair 一起使用")
+        if users:
+            folders = []
+            for user in users:
+                folder = resolve_user_folder(self.config.OUTPUT_DIR_PATH, self.config.USER_ID_TO_NAME_MAP, user)
+                if folder:
+                    folders.append(folder)
+                else:
+                    logger.warning(f"  - 警告：未找到用户 '{user}' 的文件夹，跳过。")
+        else:
+            folders = list_user_folders(self.config.OUTPUT_DIR_PATH)
+
+        def audit_one(folder: str):
+            user_folder = os.path.join(self.config.OUTPUT_DIR_PATH, folder)
+            if not repair:
+                return self.processor.audit_folder(user_folder)
+            # 修复会删除 .part 文件并改写 undownloaded.json 等文件，必须持有与下载进程相同的用户锁
+            user_id = find_user_id(self.config.OUTPUT_DIR_PATH, folder, self.config.USER_ID_TO_NAME_MAP)
+            if user_id is None:
+                logger.warning(f"  - 警告：无法确定文件夹 '{folder}' 对应的用户ID，无法加锁，跳过修复。")
+                return None
+            user_lock = self._make_lock(f"user_{user_id}")
+            try:
+                user_lock.acquire()
+            except LockUnavailable as e:
+                logger.warning(f"  - 警告：用户 '{folder}' 正在被其他进程处理，跳过修复。({e})")
+                return None
+            try:
+                return self.processor.audit_folder(user_folder, repair, download)
+            finally:
+                user_lock.release()
+
+        logger.log(SUMMARY, f"正在检查 {len(folders)} 个用户文件夹的完整性{'并修复' if repair else ''}...")
+        start_time = time.perf_counter()
+        total_issues = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers or self.config.AUDIT_WORKERS) as executor:
+                for report in executor.map(audit_one, folders):
+                    if report is None:
+                        continue
+                    total_issues += report.issue_count
+                    logger.log(SUMMARY, f"  - {report.summary()}", extra={"event": "audit", "folder": report.folder,
+                                                                          "issues": report.issue_count})
+        finally:
+            self.processor.close()
+        logger.log(SUMMARY, f"\n检查完成！共发现 {total_issues} 个问题，耗时 {time.perf_counter() - start_time:.2f}s。")
+
+    def _report_user(self, user_id: int, stats: dict, duration: float, log_file_path: str):
+        """输出单个用户的处理汇总，并追加到处理时间日志中。"""
+        user_name = stats.get("folder_name", str(user_id))
+        
+        minutes, seconds = divmod(duration, 60)
+        hours, minutes = divmod(minutes, 60)
+        time_str = f"{int(hours)}h {int(minutes)}m {seconds:.2f}s"
+        
+        console_message = (
+            f"\n>>>>>>>>> 完成用户 '{user_name}' 的处理，总耗时: {time_str} <<<<<<<<<\n"
+            f"  - 本次处理动态数: {stats['processed_posts']}\n"
+            f"  - 成功下载图片数: {stats['downloaded_images']}\n"
+            f"  - 下载失败图片数: {stats['failed_images']}\n"
+            f">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
+        )
+        
+        log_entry_obj = LogEntry(
+            user_id=user_id,
+            user_name=user_name,
+            timestamp=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            duration=time_str,
+            duration_seconds=round(duration, 2),
+            processed_posts=stats['processed_posts'],
+            downloaded_images=stats['downloaded_images'],
+            failed_images=stats['failed_images']
+        )
+
+        logger.log(SUMMARY, console_message, extra={"event": "user_summary", **asdict(log_entry_obj)})
+
+        self._write_log(log_file_path, asdict(log_entry_obj))
+
+    def _run_prioritized(self, user_ids: List[int], log_file_path: str, shard: Optional[Tuple[int, int]]):
+        """
+        优先级队列模式：先获取所有用户的动态列表，再跨用户按 新动态 > 重试 > 回填 的顺序执行，
+        最后为每个用户保存剩余的工作。整个运行期间持有所有被处理用户的锁。
+        获取动态列表期间预算用尽时，剩余用户写入 pending_users.json，下次运行时优先处理。
+        由于各用户的任务交错执行，日志中每个用户的耗时为整个运行的耗时。
+        """
+        start_time = time.perf_counter()
+        budget = self.processor.budget
+        locks = []
+        works = []
+        remaining_users: List[int] = []
+        try:
+            for position, user_id in enumerate(user_ids):
+                if not budget.check():
+                    logger.log(SUMMARY, f"\n本次运行的预算已用尽（{budget.exhausted_reason}），剩余 {len(user_ids) - position} 个用户将在下次运行时处理。")
+                    remaining_users = user_ids[position:]
+                    break
+                user_lock = self._make_lock(f"user_{user_id}")
+                try:
+                    user_lock.acquire()
+                except LockUnavailable as e:
+                    logger.log(SUMMARY, f"\n用户 {user_id} 正在被其他进程处理，跳过。({e})")
+                    continue
+                locks.append(user_lock)
+                work = self.processor.prepare_user(user_id, f"https://space.bilibili.com/{user_id}/article")
+                if work is not None:
+                    works.append(work)
+
+            logger.log(SUMMARY, f"\n[优先级队列] 开始处理 {len(works)} 个用户的工作...")
+            try:
+                self.processor.run_queue(works)
+            except KeyboardInterrupt:
+                logger.warning("\n\n程序被用户中断。正在保存剩余工作并退出...")
+
+            # 即使运行被中断或预算用尽，也要保存每个用户剩余的工作
+            duration = time.perf_counter() - start_time
+            for work in works:
+                stats = self.processor.finalize_user(work)
+                self._report_user(work.user_id, stats, duration, log_file_path)
+            self._save_pending_users(shard, remaining_users)
+        except KeyboardInterrupt:
+            logger.warning("\n\n程序被用户中断。正在退出...")
+        finally:
+            for user_lock in locks:
+                user_lock.release()
+            self.processor.close()
+
+    def run(self, shard: Optional[Tuple[int, int]] = None):
         """
         启动下载器的主入口点。
+        :param shard: 可选的 (分片序号, 分片总数)，只处理按用户ID哈希后属于该分片的用户，
+                      用于多台机器共同处理同一个输出目录。
         """
-        print(f"正在从 'config.py' 的 USERS_ID 列表读取用户 ID...")
+        logger.info(f"正在从 'config.py' 的 USERS_ID 列表读取用户 ID...")
         user_ids = self.config.USERS_ID
         
         if not user_ids:
-            print(f"错误：配置文件中的 USERS_ID 列表为空。")
+            logger.error(f"错误：配置文件中的 USERS_ID 列表为空。")
             return
 
+        if shard:
+            user_ids = [user_id for user_id in user_ids if in_shard(user_id, shard)]
+            logger.log(SUMMARY, f"分片 {shard[0]}/{shard[1]}：本进程负责 {len(user_ids)} 个用户。")
+
         log_file_path = os.path.join(self.config.OUTPUT_DIR_PATH, "processing_time_log.json")
 
+        # 上次运行因预算用尽而未处理的用户排在最前面，避免列表末尾的用户一直得不到处理
+        pending_users = [user_id for user_id in self._load_pending_users(shard) if user_id in user_ids]
+        if pending_users:
+            logger.info(f"  - 检测到 {len(pending_users)} 个上次运行未处理的用户，将优先处理。")
+            pending_set = set(pending_users)
+            user_ids = pending_users + [user_id for user_id in user_ids if user_id not in pending_set]
+
+        if self.config.PRIORITY_QUEUE:
+            self._run_prioritized(user_ids, log_file_path, shard)
+            logger.log(SUMMARY, f"\n所有任务已完成！日志已保存到: {log_file_path}")
+            return
+
+        remaining_users: List[int] = []
+
         try:
-            for user_id in user_ids:
+            for position, user_id in enumerate(user_ids):
                 start_time = time.perf_counter()
 
                 user_url = f"https://space.bilibili.com/{user_id}/article"
-                stats = self.processor.process_user(user_id, user_url)
-
-                end_time = time.perf_counter()
-                duration = end_time - start_time
-                
-                user_name = stats.get("folder_name", str(user_id))
-                
-                minutes, seconds = divmod(duration, 60)
-                hours, minutes = divmod(minutes, 60)
-                time_str = f"{int(hours)}h {int(minutes)}m {seconds:.2f}s"
-                
-                console_message = (
-                    f"\n>>>>>>>>> 完成用户 '{user_name}' 的处理，总耗时: {time_str} <<<<<<<<<\n"
-                    f"  - 本次处理动态数: {stats['processed_posts']}\n"
-                    f"  - 成功下载图片数: {stats['downloaded_images']}\n"
-                    f"  - 下载失败图片数: {stats['failed_images']}\n"
-                    f">>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
-                )
-                print(console_message)
-                
-                log_entry_obj = LogEntry(
-                    user_id=user_id,
-                    user_name=user_name,
-                    timestamp=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    duration=time_str,
-                    duration_seconds=round(duration, 2),
-                    processed_posts=stats['processed_posts'],
-                    downloaded_images=stats['downloaded_images'],
-                    failed_images=stats['failed_images']
-                )
-
-                self._write_log(log_file_path, asdict(log_entry_obj))
+                # 同一用户同一时间只能由一个进程处理，被其他进程持有锁的用户直接跳过
+                user_lock = self._make_lock(f"user_{user_id}")
+                try:
+                    user_lock.acquire()
+                except LockUnavailable as e:
+                    logger.log(SUMMARY, f"\n用户 {user_id} 正在被其他进程处理，跳过。({e})")
+                    continue
+                try:
+                    stats = self.processor.process_user(user_id, user_url)
+                finally:
+                    user_lock.release()
+
+                self._report_user(user_id, stats, time.perf_counter() - start_time, log_file_path)
+
+                budget = self.processor.budget
+                if budget.exhausted:
+                    logger.log(SUMMARY, f"\n本次运行的预算已用尽（{budget.exhausted_reason}），剩余用户将在下次运行时处理。")
+                    # 当前用户可能还有保存在 pending_posts.json 中的动态，下次运行时同样优先处理
+                    remaining_users = user_ids[position:]
+                    break
 
+            self._save_pending_users(shard, remaining_users)
         except KeyboardInterrupt:
-            print("\n\n程序被用户中断。正在退出...")
+            logger.warning("\n\n程序被用户中断。正在退出...")
+        finally:
+            self.processor.close()
         
-        print(f"\n所有任务已完成！日志已保存到: {log_file_path}")
\ No newline at end of file
+        logger.log(SUMMARY, f"\n所有任务已完成！日志已保存到: {log_file_path}")
\ No newline at end of file
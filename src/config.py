@@ -74,4 +74,93 @@ class Config:
     COOKIE_FILE_PATH = "C:/Base1/bili/gallery-dl/space.bilibili.com_cookies.txt"
     
     # 图片和元数据保存的基础输出目录
-    OUTPUT_DIR_PATH = "C:/Base1/bili/gallery-dl/bilibili_images"
\ No newline at end of file
+    OUTPUT_DIR_PATH = "C:/Base1/bili/gallery-dl/bilibili_images"
+
+    # 图片后处理开关。开启后，每张下载完成的图片都会在独立的进程池中进行校验
+    # （魔数检查、纠正扩展名、解码检查），校验失败的图片会被删除并加入 undownloaded.json。
+    # 处理结果记录在用户文件夹的 metadata/postprocess.json 中，不会重复处理。
+    # 解码检查、缩略图和格式转换需要安装 Pillow。
+    IMAGE_POSTPROCESS = False
+
+    # 图片后处理进程池的进程数
+    IMAGE_POSTPROCESS_WORKERS = 2
+
+    # 缩略图的最大宽高（像素），保存在用户文件夹的 thumbnails 子目录中。设为 None 则不生成。
+    IMAGE_THUMBNAIL_SIZE = None  # 例如 (320, 320)
+
+    # 将图片重新编码为指定格式以节省空间，可选 'webp' 或 'avif'。设为 None 则不转换。
+    IMAGE_CONVERT_FORMAT = None
+
+    # 转换格式后是否保留原始图片文件（保留的原始文件移入用户文件夹下的 originals 子目录）
+    IMAGE_KEEP_ORIGINAL = False
+
+    # 图片下载策略。默认下载 gallery-dl 返回的原图。
+    # 可以将 Bilibili 图床地址改写为服务端缩放/压缩后的变体，或按 HEAD 请求返回的原图大小进行限制：
+    #   "max_width": 最大宽度（像素），"quality": 压缩质量（1-100），"format": 'webp' / 'avif' / 'jpg' / 'png'
+    #   "max_bytes": 原图大小上限（字节），为 None 时始终下载变体
+    #   "oversize_action": 原图超过上限时的处理方式，"variant"（下载变体）或 "skip"（跳过）
+    # 被降级或跳过的图片会连同原图地址记录在用户文件夹的 backfill.json 中，供之后回填原图。
+    # DEFAULT_DOWNLOAD_POLICY 对所有用户生效，USER_DOWNLOAD_POLICY 按用户ID（字符串）覆盖默认策略。
+    DEFAULT_DOWNLOAD_POLICY = None
+    USER_DOWNLOAD_POLICY = {
+        # "9293142": {"max_width": 1080, "quality": 85, "format": "webp"},
+        # "16322326": {"max_width": 1080, "format": "webp", "max_bytes": 2 * 1024 * 1024},
+    }
+
+    # 原图回填开关。开启后，会为 backfill.json 中记录的图片重新下载原图并替换本地的变体文件。
+    RUN_FULL_QUALITY_BACKFILL = False
+
+    # 全局下载限速（字节/秒），所有下载共享。设为 None 则不限速。
+    MAX_DOWNLOAD_BYTES_PER_SECOND = None  # 例如 2 * 1024 * 1024
+
+    # 单次运行的下载预算。达到任意一项上限后，程序会停止开始新的下载，
+    # 并把剩余的动态和图片分别保存到 pending_posts.json 和 undownloaded.json，下次运行时优先处理。
+    RUN_MAX_DOWNLOAD_BYTES = None   # 例如 20 * 1024 ** 3
+    RUN_MAX_DOWNLOAD_IMAGES = None  # 例如 5000
+
+    # 输出目录所在磁盘至少保留的剩余空间（字节）。低于该值时按预算用尽处理。设为 None 则不检查。
+    MIN_FREE_DISK_BYTES = None  # 例如 10 * 1024 ** 3
+    # 单次运行的时间上限（秒）。到达后不再开始新的下载，剩余工作保存到下次运行。None 表示不限制。
+    RUN_TIME_BUDGET_SECONDS = None
+
+    # 导出格式（python main.py export），可选 'parquet'、'arrow' 或 'sqlite'。
+    # 导出文件保存在 OUTPUT_DIR_PATH/_export 中；未安装 pyarrow 时自动改为 'sqlite'。
+    EXPORT_FORMAT = "parquet"
+
+    # 日志设置。日志由后台线程统一写出，不阻塞下载。
+    # LOG_FORMAT: 'text'（与原来的控制台输出相同）或 'json'（每行一个 JSON 对象，便于日志收集系统解析）
+    # LOG_QUIET: 安静模式，控制台只显示进度条和每个用户的汇总信息（也可使用命令行参数 --quiet）
+    # LOG_FILE: 可选的日志文件路径，文件中始终记录 LOG_LEVEL 及以上的完整日志
+    LOG_LEVEL = "INFO"
+    LOG_FORMAT = "text"
+    LOG_QUIET = False
+    LOG_FILE = None
+
+    # 多进程/多主机协作。每个用户在处理期间会在 OUTPUT_DIR_PATH/.locks 下持有一个锁文件，
+    # 其他进程会跳过被锁定的用户。锁文件的心跳超过 LOCK_STALE_SECONDS 秒未更新时视为过期，可被接管。
+    LOCK_STALE_SECONDS = 600
+
+    # 分片设置，格式为 'i/n'（i 从 0 开始），例如三台机器分别使用 '0/3'、'1/3'、'2/3'。
+    # 每个用户按用户ID的稳定哈希分配到唯一的分片。设为 None 则处理所有用户（也可使用命令行参数 run --shard）。
+    SHARD = None
+
+    # 完整性检查（audit 子命令）并行检查用户文件夹的线程数
+    AUDIT_WORKERS = 4
+
+    # 优先级队列模式：先获取所有用户的动态列表，再跨用户按优先级处理——
+    # 所有用户的新动态（从新到旧）最先处理，其次是上次运行留下的 pending_posts.json 中的动态和 undownloaded.json 中待重试的图片，然后回填原图（需开启 RUN_FULL_QUALITY_BACKFILL），
+    # 非增量模式下最后才重新检查已归档的历史动态。
+    # 配合 RUN_TIME_BUDGET_SECONDS 使用时，有限的运行时间总是优先用于抓取最新内容。暂不支持与异步模式同时使用。
+    PRIORITY_QUEUE = False
+
+    # 异步模式（需要安装 aiohttp）：gallery-dl 调用、图片下载和文件写入都不再阻塞，
+    # 单个进程即可同时进行数百个请求。未安装 aiohttp 时自动回退到同步模式。
+    ASYNC_MODE = False
+    # 同时运行的 gallery-dl 进程数上限
+    ASYNC_MAX_GALLERY_DL = 4
+    # 同时进行的图片下载（HTTP 连接池大小）上限
+    ASYNC_MAX_DOWNLOADS = 64
+    # 同一用户同时处理的动态数上限
+    ASYNC_MAX_POSTS = 16
+    # 用于文件写入的线程数
+    ASYNC_FILE_WORKERS = 4
@@ -2,6 +2,9 @@
 
 import sqlite3
 from typing import Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class ArchiveDB:
     """管理所有与 SQLite 归档数据库的交互。"""
@@ -18,7 +21,7 @@ class ArchiveDB:
             self.conn = sqlite3.connect(self.db_path)
             self._create_table()
         except sqlite3.Error as e:
-            print(f"致命错误：无法连接到数据库 {self.db_path}: {e}")
+            logger.error(f"致命错误：无法连接到数据库 {self.db_path}: {e}")
             raise
 
     def _create_table(self):
@@ -40,7 +43,7 @@ class ArchiveDB:
             cursor.execute("SELECT 1 FROM archive WHERE entry = ?", (entry,))
             return cursor.fetchone() is not None
         except sqlite3.Error as e:
-            print(f"  - 警告：无法查询归档数据库: {e}")
+            logger.warning(f"  - 警告：无法查询归档数据库: {e}")
             return False
             
     # --- 新增方法 ---
@@ -60,7 +63,7 @@ class ArchiveDB:
             cursor.execute("SELECT 1 FROM archive WHERE entry LIKE ? LIMIT 1", (pattern,))
             return cursor.fetchone() is not None
         except sqlite3.Error as e:
-            print(f"  - 警告：无法查询归档数据库中的 ID: {e}")
+            logger.warning(f"  - 警告：无法查询归档数据库中的 ID: {e}")
             return False
     # --- 新增结束 ---
 
@@ -74,12 +77,12 @@ class ArchiveDB:
         try:
             with self.conn:
                 self.conn.execute("INSERT INTO archive (entry) VALUES (?)", (entry,))
-            print(f"  - 已添加到归档: {entry}")
+            logger.info("  - 已添加到归档: %s", entry, extra={"event": "archive_add", "entry": entry})
         except sqlite3.Error as e:
-            print(f"  - 警告：添加 '{entry}' 到归档失败: {e}")
+            logger.warning(f"  - 警告：添加 '{entry}' 到归档失败: {e}")
 
     def close(self):
         """关闭数据库连接。"""
         if self.conn:
             self.conn.close()
-            print("\n正在关闭归档数据库连接。")
\ No newline at end of file
+            logger.info("\n正在关闭归档数据库连接。")
\ No newline at end of file
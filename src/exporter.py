@@ -0,0 +1,220 @@
+# exporter.py
+
+import os
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 是可选依赖，缺失时回退到 SQLite
+    pa = None
+
+from config import Config
+from user_folders import CONTENT_FILE_PATTERN, IMAGE_FILE_PATTERN
+
+EXPORT_DIRNAME = "_export"
+SQLITE_FILENAME = "archive.sqlite"
+SUPPORTED_FORMATS = ("parquet", "arrow", "sqlite")
+
+COLUMNS = ("folder", "id_str", "url", "username", "pub_ts", "pub_time", "title", "content",
+           "likes", "comments", "forwards", "favorites", "image_count", "image_bytes", "images")
+
+
+class ArchiveExporter:
+    """
+    将用户文件夹中的内容 JSON 和图片信息汇总为每个用户一个列式数据集（Parquet / Arrow），
+    没有安装 pyarrow 时写入 SQLite 表。导出是增量的：只重新读取自上次导出以来发生变化的动态。
+    """
+
+    def __init__(self, config: Config, export_format: Optional[str] = None):
+        """
+        :param export_format: 'parquet'、'arrow' 或 'sqlite'，默认使用 config.EXPORT_FORMAT。
+        """
+        self.base_output_dir = config.OUTPUT_DIR_PATH
+        self.config = config
+        self.export_dir = os.path.join(self.base_output_dir, EXPORT_DIRNAME)
+        export_format = export_format or config.EXPORT_FORMAT
+        if export_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的导出格式: {export_format}")
+        if export_format != "sqlite" and pa is None:
+            logger.warning(f"  - 警告：未安装 pyarrow，无法导出为 {export_format}，将改为导出到 SQLite。")
+            export_format = "sqlite"
+        self.export_format = export_format
+
+    def export_user(self, folder: str) -> Tuple[int, int]:
+        """
+        增量导出单个用户文件夹。
+        :return: (新增或更新的动态数, 删除的动态数)
+        """
+        os.makedirs(self.export_dir, exist_ok=True)
+        user_folder = os.path.join(self.base_output_dir, folder)
+        signatures, image_lists = self._scan_user_folder(user_folder)
+
+        state_path = os.path.join(self.export_dir, f"{folder}.{self.export_format}.state.json")
+        # 导出文件被删除时执行完整导出
+        previous = self._load_state(state_path) if os.path.exists(self._output_path(folder)) else {}
+        changed = [stem for stem, signature in signatures.items() if previous.get(stem) != signature]
+        removed = [stem for stem in previous if stem not in signatures]
+
+        if not changed and not removed:
+            logger.info(f"  - '{folder}' 自上次导出以来没有变化，跳过。")
+            return 0, 0
+
+        rows = []
+        for stem in changed:
+            row = self._build_row(folder, user_folder, stem, image_lists.get(stem, []))
+            if row is not None:
+                rows.append(row)
+            else:
+                # 读取失败的文件不记录签名，下次导出时重试
+                signatures.pop(stem)
+
+        replaced_ids = [self._id_from_stem(stem) for stem in changed + removed]
+        if self.export_format == "sqlite":
+            self._write_sqlite(folder, rows, replaced_ids)
+        else:
+            self._write_arrow(folder, rows, replaced_ids)
+
+        self._save_state(state_path, signatures)
+        logger.info(f"  - 已导出 '{folder}': {len(rows)} 条动态新增或更新, {len(removed)} 条删除。")
+        return len(rows), len(removed)
+
+    def _scan_user_folder(self, user_folder: str) -> Tuple[Dict[str, List[int]], Dict[str, List[Tuple[str, int]]]]:
+        """
+        一次遍历用户文件夹，收集内容 JSON 的签名和每条动态的图片列表。
+        签名由内容 JSON 的修改时间、大小以及图片的数量和总大小组成，任何一项变化都会触发重新导出。
+        :return: (文件名主干 -> 签名, 文件名主干 -> [(图片文件名, 大小)])
+        """
+        content_stats: Dict[str, os.stat_result] = {}
+        image_lists: Dict[str, List[Tuple[str, int]]] = {}
+        with os.scandir(user_folder) as it:
+            for entry in it:
+                content_match = CONTENT_FILE_PATTERN.match(entry.name)
+                if content_match:
+                    content_stats[content_match.group(1)] = entry.stat()
+                    continue
+                image_match = IMAGE_FILE_PATTERN.match(entry.name)
+                if image_match:
+                    image_lists.setdefault(image_match.group(1), []).append((entry.name, entry.stat().st_size))
+
+        signatures = {}
+        for stem, stat in content_stats.items():
+            images = image_lists.get(stem, [])
+            signatures[stem] = [stat.st_mtime_ns, stat.st_size, len(images), sum(size for _, size in images)]
+        return signatures, image_lists
+
+    def _build_row(self, folder: str, user_folder: str, stem: str, images: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+        """读取一条动态的内容 JSON，生成导出的行数据。"""
+        try:
+            with open(os.path.join(user_folder, f"{stem}.json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"  - 警告：读取内容文件 {stem}.json 失败: {e}")
+            return None
+
+        images = sorted(images, key=lambda image: int(IMAGE_FILE_PATTERN.match(image[0]).group(2)))
+        stats = data.get("stats", {})
+        return {
+            "folder": folder,
+            # 与文件名中的 ID 保持一致，增量更新时按此列替换旧数据
+            "id_str": self._id_from_stem(stem),
+            "url": data.get("url"),
+            "username": data.get("username"),
+            "pub_ts": data.get("pub_ts"),
+            "pub_time": data.get("pub_time"),
+            "title": data.get("title"),
+            "content": data.get("content"),
+            "likes": stats.get("likes", 0),
+            "comments": stats.get("comments", 0),
+            "forwards": stats.get("forwards", 0),
+            "favorites": stats.get("favorites", 0),
+            "image_count": len(images),
+            "image_bytes": sum(size for _, size in images),
+            "images": [{"path": f"{folder}/{name}", "size": size} for name, size in images],
+        }
+
+    def _output_path(self, folder: str) -> str:
+        """获取用户数据集的导出文件路径（SQLite 格式下所有用户共用一个数据库文件）。"""
+        if self.export_format == "sqlite":
+            return os.path.join(self.export_dir, SQLITE_FILENAME)
+        return os.path.join(self.export_dir, f"{folder}.{self.export_format}")
+
+    def _id_from_stem(self, stem: str) -> str:
+        return stem.rsplit('_', 1)[-1]
+
+    def _load_state(self, state_path: str) -> Dict[str, List[int]]:
+        if not os.path.exists(state_path):
+            return {}
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"  - 警告：读取导出状态文件失败，将执行完整导出: {e}")
+            return {}
+
+    def _save_state(self, state_path: str, signatures: Dict[str, List[int]]):
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(signatures, f, ensure_ascii=False)
+
+    def _arrow_schema(self):
+        return pa.schema([
+            ("folder", pa.string()), ("id_str", pa.string()), ("url", pa.string()),
+            ("username", pa.string()), ("pub_ts", pa.int64()), ("pub_time", pa.string()),
+            ("title", pa.string()), ("content", pa.string()),
+            ("likes", pa.int64()), ("comments", pa.int64()), ("forwards", pa.int64()), ("favorites", pa.int64()),
+            ("image_count", pa.int64()), ("image_bytes", pa.int64()),
+            ("images", pa.list_(pa.struct([("path", pa.string()), ("size", pa.int64())]))),
+        ])
+
+    def _write_arrow(self, folder: str, rows: List[Dict[str, Any]], replaced_ids: List[str]):
+        """合并现有数据集和变化的行，按发布时间排序后原子地写回 Parquet / Arrow 文件。"""
+        import pyarrow.compute as pc
+
+        output_path = self._output_path(folder)
+        schema = self._arrow_schema()
+        tables = []
+        if os.path.exists(output_path):
+            existing = pq.read_table(output_path) if self.export_format == "parquet" else feather.read_table(output_path)
+            keep_mask = pc.invert(pc.is_in(existing["id_str"], value_set=pa.array(replaced_ids, pa.string())))
+            tables.append(existing.filter(keep_mask).cast(schema))
+        tables.append(pa.Table.from_pylist(rows, schema=schema))
+
+        table = pa.concat_tables(tables)
+        table = table.take(pc.sort_indices(table, sort_keys=[("pub_ts", "ascending")]))
+
+        temp_path = output_path + ".tmp"
+        if self.export_format == "parquet":
+            pq.write_table(table, temp_path, compression="zstd")
+        else:
+            feather.write_feather(table, temp_path, compression="zstd")
+        os.replace(temp_path, output_path)
+
+    def _write_sqlite(self, folder: str, rows: List[Dict[str, Any]], replaced_ids: List[str]):
+        """在 archive.sqlite 的 posts 表中删除变化的行并插入新数据。"""
+        conn = sqlite3.connect(self._output_path(folder))
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS posts ("
+                    "folder TEXT NOT NULL, id_str TEXT NOT NULL, url TEXT, username TEXT, "
+                    "pub_ts INTEGER, pub_time TEXT, title TEXT, content TEXT, "
+                    "likes INTEGER, comments INTEGER, forwards INTEGER, favorites INTEGER, "
+                    "image_count INTEGER, image_bytes INTEGER, images TEXT, "
+                    "PRIMARY KEY (folder, id_str)) WITHOUT ROWID"
+                )
+                conn.executemany("DELETE FROM posts WHERE folder = ? AND id_str = ?",
+                                 [(folder, id_str) for id_str in replaced_ids])
+                placeholders = ", ".join("?" for _ in COLUMNS)
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO posts ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                    [tuple(json.dumps(row[column], ensure_ascii=False) if column == "images" else row[column]
+                           for column in COLUMNS) for row in rows]
+                )
+        finally:
+            conn.close()
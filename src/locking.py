@@ -0,0 +1,217 @@
+# locking.py
+
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import socket
+import datetime
+import threading
+from typing import Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+LOCK_DIRNAME = ".locks"
+
+
+class LockUnavailable(Exception):
+    """锁已被其他仍然存活的进程持有。"""
+
+
+class FileLock:
+    """
+    基于锁文件的跨进程/跨主机互斥锁，适用于多台机器共享同一个 NAS 输出目录的场景。
+    锁文件通过 O_CREAT | O_EXCL 原子创建，持有期间由后台线程定期更新修改时间（心跳）。
+    心跳超过 stale_seconds 未更新，或持有者与本机相同但进程已不存在时，锁被视为过期并可被接管。
+    """
+
+    def __init__(self, lock_dir: str, name: str, stale_seconds: int):
+        """
+        :param lock_dir: 锁文件所在的目录。
+        :param name: 锁的名称，对应锁文件名。
+        :param stale_seconds: 心跳超过该秒数未更新时视为过期锁。
+        """
+        self.path = os.path.join(lock_dir, f"{name}.lock")
+        self.name = name
+        self.stale_seconds = stale_seconds
+        self.token = uuid.uuid4().hex
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def acquire(self, timeout: float = 0):
+        """
+        获取锁。
+        :param timeout: 锁被占用时最多等待的秒数，为 0 时不等待。
+        :raises LockUnavailable: 在超时前未能获取锁。
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._try_create():
+                self._start_heartbeat()
+                return
+            owner = self._read_owner()
+            if self._is_stale(owner):
+                self._break_stale_lock(owner)
+                continue
+            if time.monotonic() >= deadline:
+                raise LockUnavailable(f"锁 '{self.name}' 正被 {owner.get('host')} (pid {owner.get('pid')}) 持有")
+            time.sleep(min(1.0, max(deadline - time.monotonic(), 0.05)))
+
+    def release(self):
+        """释放锁。只会删除由本对象创建的锁文件。"""
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        if self._read_owner().get("token") == self.token:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"  - 警告：删除锁文件 {self.path} 失败: {e}")
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def _try_create(self) -> bool:
+        owner = {
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "token": self.token,
+            "acquired_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(owner, f, ensure_ascii=False)
+        return True
+
+    def _read_owner(self) -> dict:
+        return self._read_owner_from(self.path)
+
+    def _read_owner_from(self, path: str) -> dict:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # 锁文件刚被创建尚未写入内容，或已被删除
+            return {}
+
+    def _restore_lock(self, moved_path: str):
+        """把误移走的有效锁放回原处。使用硬链接，原处已有新锁时不会将其覆盖。"""
+        try:
+            os.link(moved_path, self.path)
+        except FileExistsError:
+            # 原处已经有了另一个新锁，被移走的锁无法恢复，其持有者会在释放时发现锁已不属于自己
+            logger.warning(f"  - 警告：锁 '{self.name}' 在接管过程中被其他进程重新创建，无法恢复被移走的锁。")
+        except OSError:
+            # 文件系统不支持硬链接时退回到重命名（原处不存在时等价于恢复）
+            if not os.path.exists(self.path):
+                try:
+                    os.rename(moved_path, self.path)
+                    return
+                except OSError as e:
+                    logger.warning(f"  - 警告：恢复锁文件 {self.path} 失败: {e}")
+        try:
+            os.remove(moved_path)
+        except OSError:
+            pass
+
+    def _is_stale(self, owner: dict) -> bool:
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            # 锁文件已被删除，下一轮直接重试创建
+            return False
+        if age > self.stale_seconds:
+            return True
+        if owner.get("host") == socket.gethostname() and owner.get("pid"):
+            return not _pid_alive(owner["pid"])
+        return False
+
+    def _break_stale_lock(self, owner: dict):
+        """
+        接管过期的锁。先把锁文件重命名为唯一的名称（原子操作），再确认移走的确实是判断为过期的那个锁：
+        在读取持有者和重命名之间，其他进程可能已经接管了过期锁并创建了新锁，
+        此时把新锁放回原处并放弃本次接管，由 acquire 的下一轮循环重新判断。
+        """
+        stale_path = f"{self.path}.stale.{self.token}"
+        try:
+            os.rename(self.path, stale_path)
+        except OSError:
+            return
+        if self._read_owner_from(stale_path).get("token") != owner.get("token"):
+            self._restore_lock(stale_path)
+            return
+        logger.warning(f"  - 警告：接管过期的锁 '{self.name}'（原持有者: {owner.get('host')} pid {owner.get('pid')}）。")
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+
+    def _start_heartbeat(self):
+        self._stop_heartbeat.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name=f"lock-heartbeat-{self.name}", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat(self):
+        interval = max(self.stale_seconds / 3, 1)
+        while not self._stop_heartbeat.wait(interval):
+            # 锁被判定为过期并由其他进程接管后，不能再更新新持有者的锁文件
+            owner_token = self._read_owner().get("token")
+            if owner_token is None:
+                # 锁文件暂时不存在或无法读取（例如其他进程正在接管/恢复），本轮跳过
+                continue
+            if owner_token != self.token:
+                logger.warning(f"  - 警告：锁 '{self.name}' 已被其他进程接管，停止更新心跳。")
+                return
+            try:
+                os.utime(self.path)
+            except OSError as e:
+                logger.warning(f"  - 警告：更新锁文件 {self.path} 的心跳失败: {e}")
+
+
+def _pid_alive(pid: int) -> bool:
+    """检查本机上的进程是否仍在运行。"""
+    if sys.platform == "win32":
+        # Windows 上的 os.kill 会直接结束进程，无法用来探测，只依赖心跳判断过期
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    解析 'i/n' 形式的分片参数，i 从 0 开始。
+    :raises ValueError: 格式错误或 i 不在 [0, n) 范围内。
+    """
+    try:
+        index_str, count_str = value.split("/")
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise ValueError(f"分片参数格式应为 'i/n'，例如 '0/3'，实际为: {value}")
+    if count <= 0 or not 0 <= index < count:
+        raise ValueError(f"分片序号必须满足 0 <= i < n，实际为: {value}")
+    return index, count
+
+
+def in_shard(user_id: int, shard: Optional[Tuple[int, int]]) -> bool:
+    """根据用户ID的稳定哈希判断该用户是否属于指定分片。shard 为 None 时所有用户都属于本分片。"""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(str(user_id).encode('utf-8')) % count == index
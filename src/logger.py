@@ -0,0 +1,177 @@
+# logger.py
+
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import List, Optional
+
+from tqdm import tqdm
+
+# 介于 INFO 和 WARNING 之间的级别，用于进度和汇总信息。安静模式下只输出该级别及以上的日志。
+SUMMARY = 25
+logging.addLevelName(SUMMARY, "SUMMARY")
+
+ROOT_LOGGER_NAME = "bili"
+
+# LogRecord 自带的属性，JSON 输出时只保留通过 extra 传入的结构化字段
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# 后台线程每次最多合并写出的日志条数
+BATCH_SIZE = 512
+
+_listener: Optional['BatchingQueueListener'] = None
+
+
+class TqdmHandler(logging.Handler):
+    """通过 tqdm.write 输出日志，避免与进度条交错。支持一次写出多条日志。"""
+
+    def emit(self, record: logging.LogRecord):
+        self.emit_batch([record])
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        try:
+            tqdm.write("\n".join(self.format(record) for record in records))
+        except Exception:
+            self.handleError(records[0])
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    只在本进程内使用的队列处理器。
+    标准 QueueHandler 会在调用方线程中格式化并复制日志记录（为跨进程传递做准备），
+    这里直接把记录放入队列，格式化工作全部交给后台线程。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class BatchingQueueListener(threading.Thread):
+    """
+    从队列中批量取出日志记录并交给各处理器写出的后台线程。
+    批量写出可以减少终端/文件的写入次数，也减少与下载线程争抢 GIL 的次数。
+    """
+    _SENTINEL = None
+
+    def __init__(self, log_queue: queue.Queue, handlers: List[logging.Handler]):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handlers = handlers
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if self._SENTINEL in batch:
+                stopping = True
+                batch = [record for record in batch if record is not self._SENTINEL]
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch: List[logging.LogRecord]):
+        for handler in self.handlers:
+            records = [record for record in batch if record.levelno >= handler.level]
+            if not records:
+                continue
+            if isinstance(handler, TqdmHandler):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    handler.handle(record)
+
+    def stop(self):
+        """写出队列中剩余的日志并结束线程。"""
+        self.queue.put_nowait(self._SENTINEL)
+        self.join()
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志格式化为单行 JSON，便于日志收集系统解析。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取本程序命名空间下的日志记录器，例如 get_logger(__name__)。"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def setup_logging(level: str = "INFO", log_format: str = "text", quiet: bool = False, log_file: Optional[str] = None):
+    """
+    配置日志系统。日志记录只是放入队列，由后台线程负责格式化和写入，不阻塞下载循环。
+    :param level: 日志级别，例如 'DEBUG'、'INFO'、'WARNING'。
+    :param log_format: 'text'（与原来的控制台输出相同）或 'json'（每行一个 JSON 对象）。
+    :param quiet: 安静模式，控制台只输出进度和汇总信息（SUMMARY 级别及以上）。
+    :param log_file: 可选的日志文件路径，文件中记录完整级别的日志。
+    """
+    global _listener
+    shutdown_logging()
+
+    numeric_level = logging.getLevelName(level.upper())
+    if not isinstance(numeric_level, int):
+        raise ValueError(f"未知的日志级别: {level}")
+    if log_format not in ("text", "json"):
+        raise ValueError(f"未知的日志格式: {log_format}")
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter("%(message)s")
+
+    handlers: List[logging.Handler] = []
+    console_handler = TqdmHandler()
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(max(numeric_level, SUMMARY) if quiet else numeric_level)
+    handlers.append(console_handler)
+
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        file_handler.setLevel(numeric_level)
+        handlers.append(file_handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.handlers.clear()
+    root.addHandler(LocalQueueHandler(log_queue))
+    # 安静模式且没有日志文件时，直接在记录器上过滤，连入队的开销也省掉
+    root.setLevel(max(numeric_level, SUMMARY) if quiet and not log_file else numeric_level)
+    root.propagate = False
+
+    _listener = BatchingQueueListener(log_queue, handlers)
+    _listener.start()
+
+
+def shutdown_logging():
+    """停止后台日志线程、写出队列中剩余的日志，并移除 setup_logging 添加的处理器。"""
+    global _listener
+    if _listener is not None:
+        # 先移除队列处理器，之后的日志不会再进入无人读取的队列
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        for handler in list(root.handlers):
+            if isinstance(handler, LocalQueueHandler):
+                root.removeHandler(handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
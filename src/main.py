@@ -1,21 +1,67 @@
 # main.py
 
+import argparse
 from app import Application
 from config import Config
+from locking import parse_shard
+from logger import setup_logging, shutdown_logging
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数。不带子命令时执行下载。"""
+    parser = argparse.ArgumentParser(description="Bilibili 动态图片归档工具")
+    parser.add_argument("--quiet", action="store_true", help="安静模式：只显示进度和汇总信息")
+    parser.add_argument("--log-format", choices=["text", "json"], help="日志格式，默认使用 config.LOG_FORMAT")
+    parser.add_argument("--log-file", help="日志文件路径，默认使用 config.LOG_FILE")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="下载 config.py 中所有用户的动态（默认）")
+    run_parser.add_argument("--shard", help="只处理属于第 i 个分片的用户（共 n 个分片，i 从 0 开始），格式为 'i/n'")
+
+    export_parser = subparsers.add_parser("export", help="将归档导出为每个用户一个列式数据集")
+    export_parser.add_argument("--user", action="append", help="要导出的用户文件夹名或数字ID，可重复；默认导出全部用户")
+    export_parser.add_argument("--format", choices=["parquet", "arrow", "sqlite"], help="导出格式，默认使用 config.EXPORT_FORMAT")
+
+    audit_parser = subparsers.add_parser("audit", help="检查（并修复）用户文件夹的完整性，不重新获取元数据")
+    audit_parser.add_argument("--user", action="append", help="要检查的用户文件夹名或数字ID，可重复；默认检查全部用户")
+    audit_parser.add_argument("--repair", action="store_true", help="修复发现的问题，缺失的图片会加入 undownloaded.json")
+    audit_parser.add_argument("--download", action="store_true", help="与 --repair 一起使用，修复后立即下载缺失的图片")
+    audit_parser.add_argument("--workers", type=int, help="并行检查的线程数，默认使用 config.AUDIT_WORKERS")
+
+    args = parser.parse_args()
+    if args.command == "audit" and args.download and not args.repair:
+        parser.error("--download 必须与 --repair 一起使用")
+    return args
 
 def main():
     """
     主函数，用于实例化并运行应用程序。
     """
+    args = parse_args()
+
     # 1. 创建配置对象
     app_config = Config()
+    setup_logging(
+        level=app_config.LOG_LEVEL,
+        log_format=args.log_format or app_config.LOG_FORMAT,
+        quiet=args.quiet or app_config.LOG_QUIET,
+        log_file=args.log_file or app_config.LOG_FILE
+    )
     
     # 2. 使用配置创建应用程序实例
     app = Application(app_config)
     
     # 3. 运行应用程序
-    app.run()
+    try:
+        if args.command == "export":
+            app.export(args.user, args.format)
+        elif args.command == "audit":
+            app.audit(args.user, repair=args.repair, download=args.download, workers=args.workers)
+        else:
+            shard_value = getattr(args, "shard", None) or app_config.SHARD
+            app.run(parse_shard(shard_value) if shard_value else None)
+    finally:
+        shutdown_logging()
 
 if __name__ == '__main__':
     # 当此脚本作为主程序直接运行时，调用 main 函数
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,201 @@
+# processor/async_downloader.py
+
+import os
+import asyncio
+from typing import List, Optional, Tuple
+from logger import get_logger
+from .downloader import Downloader, DownloadResult
+from .records import PendingImage
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp 是可选依赖，缺失时只能使用同步模式
+    aiohttp = None
+
+logger = get_logger(__name__)
+
+# 异步下载时每次从响应中读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+class AsyncDownloader:
+    """
+    Downloader 的异步版本：使用带连接池的 aiohttp 会话下载图片，文件写入交给线程池执行。
+    路径规则、失败列表/回填列表文件、限速器、预算和后处理器都复用同步的 Downloader。
+    """
+
+    def __init__(self, downloader: Downloader, max_connections: int):
+        """
+        :param downloader: 同步下载器，提供路径规则、列表文件读写以及限速器/预算/后处理器。
+        :param max_connections: 同时进行的图片下载（HTTP 连接）数上限。
+        """
+        if aiohttp is None:
+            raise RuntimeError("异步模式需要安装 aiohttp")
+        self.downloader = downloader
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._session: Optional['aiohttp.ClientSession'] = None
+
+    @property
+    def postprocessor(self):
+        return self.downloader.postprocessor
+
+    @property
+    def budget(self):
+        return self.downloader.budget
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        """在当前事件循环中惰性创建会话，所有下载共享同一个连接池。"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def close(self):
+        """关闭 HTTP 会话及其连接池。"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def save_undownloaded_list(self, folder: str, undownloaded_items: List[PendingImage]):
+        await asyncio.to_thread(self.downloader.save_undownloaded_list, folder, undownloaded_items)
+
+    async def save_backfill_list(self, folder: str, backfill_items: List[PendingImage], replace: bool = False):
+        await asyncio.to_thread(self.downloader.save_backfill_list, folder, backfill_items, replace)
+
+    async def retry_undownloaded(self, folder: str, user_name: str) -> Tuple[int, int, List[PendingImage]]:
+        """
+        并发地重新下载之前失败的图片。
+        :return: (成功下载数, 失败下载数, 仍然未下载的列表)
+        """
+        failed_items = await asyncio.to_thread(self.downloader.load_undownloaded_list, folder)
+        if not failed_items:
+            return 0, 0, []
+
+        logger.info(f"\n  - 检测到 'undownloaded.json'，正在尝试重新下载 {user_name} 的失败项目...")
+        results = await asyncio.gather(*(self.download_image(*item) for item in failed_items))
+
+        still_failed = [item for item, result in zip(failed_items, results) if result in ("FAILED", "DEFERRED")]
+        successful_retries = results.count("SUCCESS")
+        failed_retries = results.count("FAILED")
+        logger.info(f"  - 重试完成: {successful_retries} 个成功, {failed_retries} 个失败。")
+        return successful_retries, failed_retries, still_failed
+
+    async def run_backfill(self, folder: str, user_name: str) -> Tuple[int, int]:
+        """
+        并发地为 backfill.json 中记录的图片下载原图，替换本地的变体文件。
+        :return: (成功回填数, 失败回填数)
+        """
+        backfill_items = await asyncio.to_thread(self.downloader.load_backfill_list, folder)
+        if not backfill_items:
+            return 0, 0
+
+        logger.info(f"\n  - 正在为 {user_name} 回填 {len(backfill_items)} 张原图...")
+        results = await asyncio.gather(*(self.download_image(*item, overwrite=True) for item in backfill_items))
+        still_pending = [item for item, result in zip(backfill_items, results) if result != "SUCCESS"]
+        successful, failed = len(backfill_items) - len(still_pending), len(still_pending)
+
+        await self.save_backfill_list(folder, still_pending, replace=True)
+        logger.info(f"  - 原图回填完成: {successful} 个成功, {failed} 个失败。")
+        return successful, failed
+
+    async def head_content_length(self, url: str) -> Optional[int]:
+        """
+        通过 HEAD 请求获取远程文件的大小。
+        :return: Content-Length 字节数，无法获取时返回 None。
+        """
+        async with self._semaphore:
+            try:
+                async with self._get_session().head(url, allow_redirects=True) as response:
+                    response.raise_for_status()
+                    return response.content_length
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return None
+
+    async def download_image(self, url: str, folder: str, pub_ts: int, id_str: str, index: int, user_name: str,
+                             overwrite: bool = False) -> DownloadResult:
+        """
+        异步下载单个图片文件，行为与 Downloader.download_image 相同。
+        :param overwrite: 为 True 时即使本地已存在同名图片（例如变体文件）也重新下载并替换。
+        :return: "SUCCESS" (下载成功), "SKIPPED" (文件已存在), "FAILED" (下载失败), 或 "DEFERRED" (预算已用尽).
+        """
+        downloader = self.downloader
+        filepath = downloader.build_image_path(url, folder, pub_ts, id_str, index)
+        image_filename = os.path.basename(filepath)
+        item = PendingImage(url, folder, pub_ts, id_str, index, user_name)
+
+        existing_path = downloader.find_existing_image(filepath)
+        if existing_path and not overwrite:
+            if downloader.postprocessor:
+                downloader.postprocessor.submit(existing_path, item)
+            return "SKIPPED"
+
+        succeeded = False
+        try:
+            for attempt in range(3):
+                async with self._semaphore:
+                    # 在拿到连接名额之后再检查预算，排队期间预算可能已经用尽
+                    if downloader.budget and not downloader.budget.check():
+                        return "DEFERRED"
+                    if attempt == 0:
+                        logger.debug("  -  正在下载用户 %s 图片: %s", user_name, image_filename,
+                                     extra={"event": "download", "user": user_name, "file": image_filename})
+                    try:
+                        await self._fetch_to_file(url, filepath)
+                        succeeded = True
+                        break
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                        logger.warning("  - 下载失败: %s", e or type(e).__name__,
+                                       extra={"event": "download_error", "user": user_name,
+                                              "file": image_filename, "attempt": attempt + 1})
+                # 等待重试期间释放连接名额
+                if attempt < 2:
+                    logger.info("  - 5秒后重试... (尝试 %d/3)", attempt + 2)
+                    await asyncio.sleep(5)
+                else:
+                    logger.warning("  - 所有重试均失败，跳过此图片。",
+                                   extra={"event": "download_failed", "user": user_name, "file": image_filename})
+                    return "FAILED"
+        finally:
+            # 失败、因预算推迟或被取消时都不留下未完成的 .part 文件。
+            # 这里同步删除：任务被取消时 finally 中不宜再等待其他协程
+            if not succeeded:
+                _remove_if_exists(filepath + '.part')
+
+        if downloader.budget:
+            downloader.budget.add_image()
+        if existing_path and existing_path != filepath:
+            # 覆盖下载时删除扩展名不同的旧文件（例如 webp 变体）
+            await asyncio.to_thread(os.remove, existing_path)
+        if downloader.postprocessor:
+            if overwrite:
+                downloader.postprocessor.invalidate(filepath)
+            downloader.postprocessor.submit(filepath, item)
+        return "SUCCESS"
+
+    async def _fetch_to_file(self, url: str, filepath: str):
+        """流式下载到 .part 临时文件，完成后替换为正式文件。磁盘写入在线程池中执行，不阻塞事件循环。"""
+        limiter = self.downloader.limiter
+        budget = self.downloader.budget
+        temp_filepath = filepath + '.part'
+        async with self._get_session().get(url) as response:
+            response.raise_for_status()
+            f = await asyncio.to_thread(open, temp_filepath, 'wb')
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if limiter:
+                        # 共享同步下载使用的令牌桶，只是把阻塞等待换成 asyncio.sleep
+                        delay = limiter.reserve(len(chunk))
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    if budget:
+                        budget.add_bytes(len(chunk))
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, temp_filepath, filepath)
+
+
+def _remove_if_exists(filepath: str):
+    if os.path.exists(filepath):
+        os.remove(filepath)
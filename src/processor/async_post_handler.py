@@ -0,0 +1,108 @@
+# processor/async_post_handler.py
+
+import os
+import asyncio
+import datetime
+from typing import Tuple, List, Optional
+from api import AsyncBilibiliAPI
+from config import Config
+from logger import get_logger
+from .async_downloader import AsyncDownloader
+from .content_extractor import ContentExtractor
+from .download_policy import DownloadPolicy
+from .metadata_saver import MetadataSaver
+from .records import PendingImage, PostRecord
+
+logger = get_logger(__name__)
+
+class AsyncPostHandler:
+    """PostHandler 的异步版本：同一个动态的所有图片并发下载，元数据和内容JSON的写入在线程池中执行。"""
+
+    def __init__(self, api: AsyncBilibiliAPI, config: Config, extractor: ContentExtractor,
+                 downloader: AsyncDownloader, saver: MetadataSaver):
+        self.api = api
+        self.config = config
+        self.extractor = extractor
+        self.downloader = downloader
+        self.saver = saver
+
+    async def process(self, user_name: str, post_url: str, user_folder: str,
+                      policy: Optional[DownloadPolicy] = None) -> Tuple[bool, int, List[PendingImage], List[PendingImage]]:
+        """
+        处理单个动态，协调提取、保存和下载任务。
+        :param policy: 可选的下载策略，用于下载缩小的变体或跳过过大的原图。
+        返回一个元组: (是否继续处理下一个动态, 成功下载的图片数, 失败下载的图片列表, 需要回填原图的图片列表)
+        """
+        images_data = await self.api.get_post_metadata_async(post_url)
+        if not images_data or not isinstance(images_data[0][-1], dict):
+            logger.warning(f"  - 警告：未找到动态 {post_url} 的有效数据，跳过。")
+            return True, 0, [], []
+
+        record = PostRecord.from_metadata(images_data)
+        if record is None:
+            logger.warning(f"  - 警告：无法从元数据中获取动态 ID 或发布时间戳，跳过。")
+            return True, 0, [], []
+        id_str, pub_ts = record.id_str, record.pub_ts
+
+        try:
+            date_str = datetime.datetime.fromtimestamp(pub_ts).strftime('%Y-%m-%d')
+        except (ValueError, OSError):
+            date_str = 'unknown_date'
+
+        content_json_filepath = os.path.join(user_folder, f"{date_str}_{id_str}.json")
+        if self.config.INCREMENTAL_DOWNLOAD and os.path.exists(content_json_filepath):
+            return False, 0, [], []
+
+        metadata_filename = f"{date_str}_{id_str}.json"
+        metadata_filepath = os.path.join(user_folder, 'metadata', 'step2', metadata_filename)
+        if not os.path.exists(metadata_filepath):
+            await asyncio.to_thread(self.saver.save_step2_metadata, images_data, user_folder, date_str, pub_ts, id_str)
+        else:
+            logger.debug("  - 步骤2元数据 '%s' 已存在，跳过保存。", metadata_filename)
+
+        # 原始元数据已保存到本地，下载期间只保留精简记录
+        del images_data
+
+        items: List[PendingImage] = []
+        backfill_info: List[PendingImage] = []
+        policy_skipped_count = 0
+        for index, image_url in record.images:
+            item = PendingImage(image_url, user_folder, pub_ts, id_str, index, user_name)
+            if policy:
+                filepath = self.downloader.downloader.build_image_path(image_url, user_folder, pub_ts, id_str, index)
+                if not self.downloader.downloader.find_existing_image(filepath):
+                    download_url = await self._select_url(policy, image_url)
+                    if download_url != image_url:
+                        backfill_info.append(item)
+                    if download_url is None:
+                        policy_skipped_count += 1
+                        continue
+                    item = item._replace(url=download_url)
+            items.append(item)
+
+        results = await asyncio.gather(*(self.downloader.download_image(*item) for item in items))
+
+        successful_downloads = results.count("SUCCESS")
+        skipped_count = results.count("SKIPPED")
+        # 因预算用尽而推迟的图片同样记录下来，下次运行时重试
+        failed_downloads_info = [item for item, result in zip(items, results) if result in ("FAILED", "DEFERRED")]
+
+        if skipped_count > 0 and skipped_count == len(record.images):
+            logger.debug("  - 所有 %d 张图片均已存在，全部跳过。", skipped_count,
+                         extra={"event": "skip", "user": user_name, "id_str": id_str, "count": skipped_count})
+        elif skipped_count > 0:
+            logger.debug("  - 跳过 %d 张已存在的图片。", skipped_count,
+                         extra={"event": "skip", "user": user_name, "id_str": id_str, "count": skipped_count})
+        if policy_skipped_count > 0:
+            logger.info(f"  - 按下载策略跳过 {policy_skipped_count} 张过大的原图，已记录以便回填。")
+
+        await asyncio.to_thread(self.extractor.create_content_json_from_local_meta, user_folder, date_str, id_str)
+
+        return True, successful_downloads, failed_downloads_info, backfill_info
+
+    async def _select_url(self, policy: DownloadPolicy, image_url: str) -> Optional[str]:
+        """按下载策略选择地址；需要原图大小时先异步发起 HEAD 请求，再交给同步的 select_url 判断。"""
+        content_length = None
+        if policy.max_bytes is not None:
+            content_length = await self.downloader.head_content_length(image_url)
+        return policy.select_url(image_url, lambda _url: content_length)
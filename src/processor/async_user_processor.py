@@ -0,0 +1,150 @@
+# processor/async_user_processor.py
+
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from tqdm import tqdm
+from api import AsyncBilibiliAPI
+from logger import SUMMARY, get_logger
+from .async_post_handler import AsyncPostHandler
+from .download_policy import policy_for_user
+from .folder_resolver import FolderNameResolver
+from .metadata_saver import MetadataSaver
+from .records import PendingImage
+from .user_processor import UserProcessor
+
+logger = get_logger(__name__)
+
+class AsyncUserProcessor(UserProcessor):
+    """
+    UserProcessor 的异步版本：同一用户的多个动态由若干个协程并发处理，
+    每个动态的图片也并发下载，整体并发度由 gallery-dl 信号量和 HTTP 连接池限制。
+    """
+
+    def __init__(self, api: AsyncBilibiliAPI, resolver: FolderNameResolver, saver: MetadataSaver,
+                 handler: AsyncPostHandler, max_concurrent_posts: int):
+        """
+        :param max_concurrent_posts: 同一用户同时处理的动态数上限。
+        """
+        super().__init__(api, resolver, saver, handler)
+        self.max_concurrent_posts = max_concurrent_posts
+
+    async def process(self, user_id: int, user_url: str) -> Dict:
+        """
+        处理单个用户的主逻辑。
+        返回包含处理统计数据的字典，格式与 UserProcessor.process 相同。
+        """
+        logger.log(SUMMARY, f"\n>>>>>>>>> 开始处理用户ID: {user_id} ({user_url}) <<<<<<<<<")
+
+        logger.info("\n[步骤1] 正在获取所有动态的 URL...")
+        user_page_data = await self.api.get_initial_metadata_async(user_url)
+
+        if not user_page_data:
+            logger.info("  - 未收到任何数据，跳过此用户。")
+            return {"processed_posts": 0, "downloaded_images": 0, "failed_images": 0, "folder_name": str(user_id)}
+
+        post_urls = [item[1] for item in user_page_data if len(item) > 1]
+        logger.info(f"找到了 {len(post_urls)} 条动态。")
+
+        # 文件夹名称每个用户只确定一次，直接在线程中复用同步的解析逻辑
+        folder_name = await asyncio.to_thread(self.resolver.determine_folder_name, user_id, user_page_data, post_urls)
+        user_folder = os.path.join(self.resolver.base_output_dir, folder_name)
+        os.makedirs(user_folder, exist_ok=True)
+        logger.info(f"用户识别为: '{folder_name}'")
+        logger.info(f"文件将保存至: {user_folder}")
+
+        await asyncio.to_thread(self.saver.save_step1_metadata, user_url, user_folder, user_page_data)
+        del user_page_data
+
+        downloader = self.handler.downloader
+        successful_retries, _, persistent_failures = await downloader.retry_undownloaded(user_folder, folder_name)
+
+        successful_backfills = 0
+        if self.handler.config.RUN_FULL_QUALITY_BACKFILL:
+            successful_backfills, _ = await downloader.run_backfill(user_folder, folder_name)
+
+        pending_posts = await asyncio.to_thread(self._load_pending_posts, user_folder)
+        if pending_posts:
+            logger.info(f"  - 检测到 {len(pending_posts)} 条上次运行未处理的动态，将优先处理。")
+            pending_set = set(pending_posts)
+            post_urls = pending_posts + [url for url in post_urls if url not in pending_set]
+
+        policy = policy_for_user(self.handler.config, user_id)
+        if policy:
+            logger.info(f"  - 已为该用户启用下载策略: {policy}")
+
+        logger.info(f"\n[步骤2] 开始并发处理用户 '{folder_name}' 的 {len(post_urls)} 条动态...")
+        results, remaining_posts = await self._process_posts(post_urls, folder_name, user_folder, policy)
+
+        processed_posts_count = 0
+        total_successful_downloads = successful_retries + successful_backfills
+        session_failures: List[PendingImage] = []
+        session_backfills: List[PendingImage] = []
+        for should_continue, successful, new_failures, new_backfills in results:
+            if not should_continue:
+                continue
+            processed_posts_count += 1
+            total_successful_downloads += successful
+            session_failures.extend(new_failures)
+            session_backfills.extend(new_backfills)
+
+        # 等待图片后处理完成（会阻塞，放到线程中执行），校验失败的图片需要重新下载
+        if downloader.postprocessor:
+            session_failures.extend(await asyncio.to_thread(downloader.postprocessor.finish, user_folder))
+
+        all_failures = persistent_failures + session_failures
+        await downloader.save_undownloaded_list(user_folder, all_failures)
+        await asyncio.to_thread(self._save_pending_posts, user_folder, remaining_posts)
+        if session_backfills:
+            await downloader.save_backfill_list(user_folder, session_backfills)
+
+        return {
+            "processed_posts": processed_posts_count,
+            "downloaded_images": total_successful_downloads,
+            "failed_images": len(all_failures),
+            "folder_name": folder_name
+        }
+
+    async def _process_posts(self, post_urls: List[str], folder_name: str, user_folder: str,
+                             policy) -> Tuple[List[Tuple], List[str]]:
+        """
+        由 max_concurrent_posts 个协程按顺序领取并处理动态。
+        增量模式下遇到已下载的动态、或预算用尽时不再领取新的动态，已经开始的动态会正常完成。
+        :return: (各动态的处理结果, 因预算用尽而未开始处理的动态 URL 列表)
+        """
+        budget = self.handler.downloader.budget
+        results: List[Optional[Tuple]] = [None] * len(post_urls)
+        next_position = 0
+        stop_reason: Optional[str] = None
+
+        progress = tqdm(total=len(post_urls), desc=f"处理动态", unit=" 条")
+
+        async def worker():
+            nonlocal next_position, stop_reason
+            while stop_reason is None and next_position < len(post_urls):
+                if budget and not budget.check():
+                    stop_reason = "budget"
+                    logger.log(SUMMARY, f"\n  - 预算已用尽：{budget.exhausted_reason}。将停止处理用户 '{folder_name}' 的剩余动态。")
+                    return
+                position = next_position
+                next_position += 1
+                results[position] = await self.handler.process(folder_name, post_urls[position], user_folder, policy)
+                progress.update(1)
+                if not results[position][0] and stop_reason is None:
+                    stop_reason = "incremental"
+                    logger.log(SUMMARY, f"\n  - 增量下载模式：检测到已下载的内容，将停止处理用户 '{folder_name}' 的剩余动态。")
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_concurrent_posts)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # 某个协程出错（或整个任务被取消）时，同时取消其他仍在运行的协程，不让它们在后台继续下载
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            progress.close()
+
+        remaining_posts = post_urls[next_position:] if stop_reason == "budget" else []
+        return [result for result in results if result is not None], remaining_posts
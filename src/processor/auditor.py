@@ -0,0 +1,160 @@
+# processor/auditor.py
+
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from user_folders import CONTENT_FILE_PATTERN, IMAGE_FILE_PATTERN
+from logger import get_logger
+from .content_extractor import ContentExtractor
+from .downloader import Downloader
+from .records import PendingImage, PostRecord
+
+logger = get_logger(__name__)
+
+@dataclass
+class AuditReport:
+    """单个用户文件夹的完整性检查结果。"""
+    folder: str
+    posts: int = 0
+    # 步骤2元数据中记录、但本地不存在（或为空文件）的图片
+    missing_images: List[PendingImage] = field(default_factory=list)
+    # 有步骤2元数据、但缺少最终内容JSON的动态（文件名主干）
+    missing_content: List[str] = field(default_factory=list)
+    # 没有对应步骤2元数据的内容JSON / 图片文件
+    orphan_contents: List[str] = field(default_factory=list)
+    orphan_images: List[str] = field(default_factory=list)
+    # 大小为 0 的文件、下载中断留下的 .part 文件、无法解析的步骤2元数据（相对路径）
+    zero_byte_files: List[str] = field(default_factory=list)
+    partial_files: List[str] = field(default_factory=list)
+    corrupt_metadata: List[str] = field(default_factory=list)
+    # undownloaded.json 中本地已存在的条目数
+    stale_undownloaded: int = 0
+
+    @property
+    def issue_count(self) -> int:
+        return (len(self.missing_images) + len(self.missing_content) + len(self.orphan_contents)
+                + len(self.orphan_images) + len(self.zero_byte_files) + len(self.partial_files)
+                + len(self.corrupt_metadata) + self.stale_undownloaded)
+
+    def summary(self) -> str:
+        return (
+            f"'{self.folder}': {self.posts} 条动态, 缺失图片 {len(self.missing_images)}, "
+            f"缺失内容JSON {len(self.missing_content)}, 孤立内容JSON {len(self.orphan_contents)}, "
+            f"孤立图片 {len(self.orphan_images)}, 空文件 {len(self.zero_byte_files)}, "
+            f"未完成下载 {len(self.partial_files)}, 损坏的元数据 {len(self.corrupt_metadata)}, "
+            f"过期的重试条目 {self.stale_undownloaded}"
+        )
+
+
+class FolderAuditor:
+    """
+    检查用户文件夹的完整性，并在不重新获取元数据的前提下进行修复。
+    以本地步骤2元数据为准，与磁盘上的图片和内容JSON进行交叉比对。
+    """
+
+    def __init__(self, downloader: Downloader, extractor: ContentExtractor):
+        self.downloader = downloader
+        self.extractor = extractor
+
+    def audit(self, user_folder: str) -> AuditReport:
+        """
+        扫描一个用户文件夹（用户文件夹和 step2 目录各遍历一次），返回检查结果。此方法不修改任何文件。
+        """
+        folder_name = os.path.basename(user_folder)
+        report = AuditReport(folder=folder_name)
+
+        contents = set()
+        images: Dict[Tuple[str, int], str] = {}
+        with os.scandir(user_folder) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith('.part'):
+                    report.partial_files.append(entry.name)
+                    continue
+                if entry.stat().st_size == 0:
+                    report.zero_byte_files.append(entry.name)
+                    continue
+                content_match = CONTENT_FILE_PATTERN.match(entry.name)
+                if content_match:
+                    contents.add(content_match.group(1))
+                    continue
+                image_match = IMAGE_FILE_PATTERN.match(entry.name)
+                if image_match:
+                    images[(image_match.group(1), int(image_match.group(2)))] = entry.name
+
+        step2_dir = os.path.join(user_folder, 'metadata', 'step2')
+        step2_stems = set()
+        backfill_keys = {(item.id_str, item.index) for item in self.downloader.load_backfill_list(user_folder)}
+        if os.path.isdir(step2_dir):
+            with os.scandir(step2_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    relative_path = os.path.join('metadata', 'step2', entry.name)
+                    if entry.stat().st_size == 0:
+                        report.zero_byte_files.append(relative_path)
+                        continue
+                    stem = entry.name[:-len('.json')]
+                    record = self._load_record(entry.path)
+                    if record is None:
+                        report.corrupt_metadata.append(relative_path)
+                        continue
+
+                    step2_stems.add(stem)
+                    report.posts += 1
+                    if stem not in contents:
+                        report.missing_content.append(stem)
+                    for index, url in record.images:
+                        # 按下载策略有意跳过的原图记录在 backfill.json 中，不算作缺失
+                        if (stem, index) not in images and (record.id_str, index) not in backfill_keys:
+                            report.missing_images.append(
+                                PendingImage(url, user_folder, record.pub_ts, record.id_str, index, folder_name))
+
+        report.orphan_contents = sorted(stem for stem in contents if stem not in step2_stems)
+        report.orphan_images = sorted(name for (stem, _), name in images.items() if stem not in step2_stems)
+
+        undownloaded = self.downloader.load_undownloaded_list(user_folder)
+        report.stale_undownloaded = sum(
+            1 for item in undownloaded
+            if self.downloader.find_existing_image(
+                self.downloader.build_image_path(item.url, item.folder, item.pub_ts, item.id_str, item.index))
+        )
+        return report
+
+    def repair(self, user_folder: str, report: AuditReport) -> int:
+        """
+        根据检查结果修复用户文件夹：
+        删除空文件和未完成的下载，根据本地元数据重新生成缺失的内容JSON，
+        并把缺失的图片（按元数据中的 URL）合并到 undownloaded.json，下次运行或使用 --download 时下载。
+        :return: 加入 undownloaded.json 的图片数。
+        """
+        for relative_path in report.zero_byte_files + report.partial_files:
+            try:
+                os.remove(os.path.join(user_folder, relative_path))
+            except OSError as e:
+                logger.warning(f"  - 警告：删除文件 {relative_path} 失败: {e}")
+
+        # 空的内容JSON和空图片在检查时已分别计入 missing_content 和 missing_images
+        for stem in report.missing_content:
+            date_str, id_str = stem.rsplit('_', 1)
+            self.extractor.create_content_json_from_local_meta(user_folder, date_str, id_str)
+
+        # 去掉 undownloaded.json 中已存在的条目，并加入缺失的图片
+        undownloaded = self.downloader.load_undownloaded_list(user_folder)
+        queued = [
+            item for item in undownloaded + report.missing_images
+            if not self.downloader.find_existing_image(
+                self.downloader.build_image_path(item.url, item.folder, item.pub_ts, item.id_str, item.index))
+        ]
+        self.downloader.save_undownloaded_list(user_folder, queued)
+        return len(queued)
+
+    def _load_record(self, metadata_path: str):
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                images_data = json.load(f)
+            return PostRecord.from_metadata(images_data)
+        except (OSError, json.JSONDecodeError, IndexError, KeyError, TypeError, AttributeError):
+            return None
@@ -0,0 +1,110 @@
+# processor/budget.py
+
+import shutil
+import threading
+import time
+from typing import Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+class BandwidthLimiter:
+    """
+    一个线程安全的令牌桶限速器，所有并发下载共享同一个带宽上限。
+    """
+
+    def __init__(self, bytes_per_second: int):
+        """
+        :param bytes_per_second: 允许的平均下载速度（字节/秒），同时也是允许的突发量。
+        """
+        if bytes_per_second <= 0:
+            raise ValueError("bytes_per_second 必须为正数")
+        self.rate = bytes_per_second
+        self._tokens = float(bytes_per_second)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> float:
+        """
+        预留 nbytes 字节的带宽。
+        :return: 调用方在继续之前应等待的秒数（可能为 0）。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self._tokens -= nbytes
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def throttle(self, nbytes: int):
+        """预留带宽，并在超出速度上限时阻塞等待。"""
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RunBudget:
+    """
+    记录单次运行的下载量，并在超出字节/图片/时间预算或磁盘剩余空间不足时停止下载。
+    所有方法均为线程安全。
+    """
+
+    def __init__(self, output_dir: str, max_bytes: Optional[int] = None,
+                 max_images: Optional[int] = None, min_free_bytes: Optional[int] = None,
+                 max_seconds: Optional[float] = None):
+        """
+        :param output_dir: 用于检查磁盘剩余空间的输出目录。
+        :param max_bytes: 单次运行最多下载的字节数，为 None 时不限制。
+        :param max_images: 单次运行最多下载的图片数，为 None 时不限制。
+        :param min_free_bytes: 输出目录所在磁盘至少保留的空间，为 None 时不检查。
+        :param max_seconds: 单次运行的时间上限（从创建本对象时开始计算），为 None 时不限制。
+        """
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+        self.max_images = max_images
+        self.min_free_bytes = min_free_bytes
+        self.max_seconds = max_seconds
+        self.deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        self.bytes_used = 0
+        self.images_used = 0
+        self.exhausted_reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """本次运行的预算是否已经用尽。"""
+        return self.exhausted_reason is not None
+
+    def check(self) -> bool:
+        """
+        检查是否还可以开始新的下载。预算一旦用尽，在本次运行中不会恢复。
+        :return: 可以继续下载时返回 True。
+        """
+        if self.exhausted_reason:
+            return False
+        with self._lock:
+            if self.max_bytes is not None and self.bytes_used >= self.max_bytes:
+                self.exhausted_reason = f"已达到本次运行的下载量上限 ({self.max_bytes} 字节)"
+            elif self.max_images is not None and self.images_used >= self.max_images:
+                self.exhausted_reason = f"已达到本次运行的图片数量上限 ({self.max_images} 张)"
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.exhausted_reason = f"已达到本次运行的时间上限 ({self.max_seconds} 秒)"
+            elif self.min_free_bytes is not None:
+                try:
+                    free_bytes = shutil.disk_usage(self.output_dir).free
+                except OSError as e:
+                    logger.warning(f"  - 警告：无法获取磁盘剩余空间: {e}")
+                    return True
+                if free_bytes < self.min_free_bytes:
+                    self.exhausted_reason = f"磁盘剩余空间不足 ({free_bytes} 字节 < {self.min_free_bytes} 字节)"
+        return self.exhausted_reason is None
+
+    def add_bytes(self, nbytes: int):
+        """记录已下载的字节数。"""
+        with self._lock:
+            self.bytes_used += nbytes
+
+    def add_image(self):
+        """记录一张已下载完成的图片。"""
+        with self._lock:
+            self.images_used += 1
@@ -3,6 +3,9 @@
 import os
 import json
 from typing import List, Dict
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class ContentExtractor:
     """负责从本地保存的原始元数据中提取信息并生成最终内容JSON文件。"""
@@ -24,7 +27,7 @@ class ContentExtractor:
 
         # 步骤1: 检查本地的 step2 元数据文件是否存在
         if not os.path.exists(step2_metadata_path):
-            print(f"  - 错误：无法找到用于提取内容的源元数据文件: {step2_metadata_filename}")
+            logger.error(f"  - 错误：无法找到用于提取内容的源元数据文件: {step2_metadata_filename}")
             return
 
         # 步骤2: 读取并解析 step2 元数据文件
@@ -32,10 +35,10 @@ class ContentExtractor:
             with open(step2_metadata_path, 'r', encoding='utf-8') as f:
                 images_data = json.load(f)
         except (json.JSONDecodeError, Exception) as e:
-            print(f"  - 错误：读取或解析源元数据文件 {step2_metadata_filename} 失败: {e}")
+            logger.error(f"  - 错误：读取或解析源元数据文件 {step2_metadata_filename} 失败: {e}")
             return
             
-        print(f"  - 正在从本地元数据 '{step2_metadata_filename}' 中提取内容...")
+        logger.debug("  - 正在从本地元数据 '%s' 中提取内容...", step2_metadata_filename)
 
         # 步骤3: 从加载的数据中提取所有字段
         try:
@@ -110,9 +113,10 @@ class ContentExtractor:
             }
 
             # 步骤5: 写入最终的内容JSON文件
-            print(f"  - 正在创建最终内容JSON文件: {final_content_filename}")
+            logger.debug("  - 正在创建最终内容JSON文件: %s", final_content_filename,
+                         extra={"event": "save_content", "id_str": id_str_from_meta})
             with open(final_content_filepath, 'w', encoding='utf-8') as f:
                 json.dump(data_to_save, f, ensure_ascii=False, indent=4)
 
         except (IndexError, KeyError, TypeError, ValueError) as e:
-            print(f"  - 从本地元数据提取信息时发生错误: {e}")
\ No newline at end of file
+            logger.error(f"  - 从本地元数据提取信息时发生错误: {e}")
\ No newline at end of file
@@ -0,0 +1,95 @@
+# processor/download_policy.py
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from config import Config
+
+# Bilibili 图床（hfs）图片地址，例如 https://i0.hdslb.com/bfs/new_dyn/xxxx.jpg
+BILIBILI_HFS_PATTERN = re.compile(r'^https?://i\d\.hdslb\.com/bfs/', re.IGNORECASE)
+
+SUPPORTED_VARIANT_FORMATS = ('webp', 'avif', 'jpg', 'png')
+
+@dataclass
+class DownloadPolicy:
+    """
+    描述单个用户的图片下载策略。
+    可以将 Bilibili 图床地址改写为服务端缩放/压缩后的变体（例如 '@1080w_85q.webp'），
+    或者根据 HEAD 请求返回的 Content-Length 限制原图大小。
+    """
+    max_width: Optional[int] = None
+    quality: Optional[int] = None
+    image_format: Optional[str] = None
+    # 原图大小上限（字节）。为 None 时不检查原图大小，始终使用变体（如已配置）。
+    max_bytes: Optional[int] = None
+    # 原图超过 max_bytes 时的处理方式: "variant"（改为下载变体）或 "skip"（跳过，留待回填）
+    oversize_action: str = "variant"
+
+    def __post_init__(self):
+        if self.image_format and self.image_format not in SUPPORTED_VARIANT_FORMATS:
+            raise ValueError(f"不支持的变体格式: {self.image_format}")
+        if self.oversize_action not in ("variant", "skip"):
+            raise ValueError(f"未知的 oversize_action: {self.oversize_action}")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DownloadPolicy':
+        """根据 config.py 中的字典配置创建策略对象。"""
+        return cls(
+            max_width=data.get("max_width"),
+            quality=data.get("quality"),
+            image_format=data.get("format"),
+            max_bytes=data.get("max_bytes"),
+            oversize_action=data.get("oversize_action", "variant"),
+        )
+
+    @property
+    def has_variant(self) -> bool:
+        """策略是否配置了服务端变体参数。"""
+        return bool(self.max_width or self.quality or self.image_format)
+
+    def variant_url(self, url: str) -> Optional[str]:
+        """
+        生成图片的服务端变体地址。
+        :return: 变体地址；不是 Bilibili 图床地址或未配置变体参数时返回 None。
+        """
+        if not self.has_variant or not BILIBILI_HFS_PATTERN.match(url):
+            return None
+        base_url = url.split('@', 1)[0]
+        params = []
+        if self.max_width:
+            params.append(f"{self.max_width}w")
+        if self.quality:
+            params.append(f"{self.quality}q")
+        suffix = "@" + "_".join(params)
+        if self.image_format:
+            suffix += f".{self.image_format}"
+        return base_url + suffix
+
+    def select_url(self, url: str, get_content_length: Callable[[str], Optional[int]]) -> Optional[str]:
+        """
+        根据策略决定实际下载的地址。
+        :param url: 原图地址。
+        :param get_content_length: 用于获取原图大小的函数（通常是一次 HEAD 请求）。
+        :return: 要下载的地址（原图或变体）；按策略应跳过时返回 None。
+        """
+        variant = self.variant_url(url)
+        if self.max_bytes is None:
+            return variant or url
+
+        content_length = get_content_length(url)
+        if content_length is None or content_length <= self.max_bytes:
+            return url
+        if self.oversize_action == "variant" and variant:
+            return variant
+        return None
+
+
+def policy_for_user(config: Config, user_id: int) -> Optional[DownloadPolicy]:
+    """
+    获取指定用户的下载策略：优先使用 USER_DOWNLOAD_POLICY 中的配置，其次使用 DEFAULT_DOWNLOAD_POLICY。
+    :return: 策略对象；未配置任何策略时返回 None（始终下载原图）。
+    """
+    policy_data = config.USER_DOWNLOAD_POLICY.get(str(user_id), config.DEFAULT_DOWNLOAD_POLICY)
+    if not policy_data:
+        return None
+    return DownloadPolicy.from_dict(policy_data)
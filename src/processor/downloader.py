@@ -6,34 +6,76 @@ import datetime
 import requests
 import time
 import json
-from typing import List, Dict, Tuple, Literal
+from typing import List, Tuple, Literal, Optional
+from logger import get_logger
+from .budget import BandwidthLimiter, RunBudget
+from .image_postprocessor import ImagePostProcessor
+from .records import PendingImage
+
+logger = get_logger(__name__)
 
 # 定义一个类型来表示下载结果，使代码更清晰
-DownloadResult = Literal["SUCCESS", "SKIPPED", "FAILED"]
+# "DEFERRED" 表示本次运行的预算已用尽，图片未被下载，应保留到下次运行
+DownloadResult = Literal["SUCCESS", "SKIPPED", "FAILED", "DEFERRED"]
+
+# 本地可能存在的图片扩展名（后处理可能会纠正扩展名或转换格式）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif')
 
 class Downloader:
     """负责下载图片文件，并管理失败的下载。"""
 
+    def __init__(self, postprocessor: Optional[ImagePostProcessor] = None,
+                 limiter: Optional[BandwidthLimiter] = None, budget: Optional[RunBudget] = None):
+        """
+        :param postprocessor: 可选的图片后处理器，下载完成的图片会被提交给它。
+        :param limiter: 可选的全局带宽限速器，所有下载共享。
+        :param budget: 可选的单次运行预算，用尽后不再开始新的下载。
+        """
+        self.postprocessor = postprocessor
+        self.limiter = limiter
+        self.budget = budget
+
     def _get_undownloaded_filepath(self, folder: str) -> str:
         """获取undownloaded.json文件的完整路径。"""
         return os.path.join(folder, 'undownloaded.json')
 
-    def retry_undownloaded(self, folder: str, user_name: str) -> Tuple[int, int, List[Dict]]:
+    def _get_backfill_filepath(self, folder: str) -> str:
+        """获取backfill.json文件的完整路径。"""
+        return os.path.join(folder, 'backfill.json')
+
+    def _load_image_list(self, filepath: str) -> List[PendingImage]:
+        """读取 undownloaded.json / backfill.json 这类图片列表文件。"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return [PendingImage.from_dict(item) for item in json.load(f)]
+
+    def _dump_image_list(self, filepath: str, items: List[PendingImage]):
+        """将图片列表以字典形式写入 JSON 文件，保持与旧版本相同的文件格式。"""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump([item._asdict() for item in items], f, indent=4, ensure_ascii=False)
+
+    def load_undownloaded_list(self, folder: str) -> List[PendingImage]:
+        """读取 undownloaded.json 中记录的下载失败的图片。"""
+        undownloaded_path = self._get_undownloaded_filepath(folder)
+        if not os.path.exists(undownloaded_path):
+            return []
+        try:
+            return self._load_image_list(undownloaded_path)
+        except (json.JSONDecodeError, IOError, KeyError, TypeError) as e:
+            logger.warning(f"  - 警告：读取 'undownloaded.json' 文件失败或格式错误: {e}")
+            return []
+
+    def retry_undownloaded(self, folder: str, user_name: str) -> Tuple[int, int, List[PendingImage]]:
         """
         尝试重新下载之前失败的图片。
         :return: (成功下载数, 失败下载数, 仍然未下载的列表)
         """
-        undownloaded_path = self._get_undownloaded_filepath(folder)
-        if not os.path.exists(undownloaded_path):
+        if not os.path.exists(self._get_undownloaded_filepath(folder)):
             return 0, 0, []
 
-        print(f"\n  - 检测到 'undownloaded.json'，正在尝试重新下载 {user_name} 的失败项目...")
+        logger.info(f"\n  - 检测到 'undownloaded.json'，正在尝试重新下载 {user_name} 的失败项目...")
         
-        try:
-            with open(undownloaded_path, 'r', encoding='utf-8') as f:
-                failed_items = json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"  - 警告：读取 'undownloaded.json' 文件失败或格式错误，跳过重试: {e}")
+        failed_items = self.load_undownloaded_list(folder)
+        if not failed_items:
             return 0, 0, []
 
         still_failed = []
@@ -41,26 +83,29 @@ class Downloader:
         failed_retries = 0
 
         for item in failed_items:
-            result = self.download_image(**item)
+            result = self.download_image(*item)
             if result == "SUCCESS":
                 successful_retries += 1
             elif result == "FAILED":
                 failed_retries += 1
                 still_failed.append(item)
+            elif result == "DEFERRED":
+                # 预算已用尽，保留到下次运行
+                still_failed.append(item)
             # 如果结果是 "SKIPPED"，意味着文件现在存在了，所以它不再是失败项，
             # 但它不是在这次重试中下载的，所以 successful_retries 不增加。
         
-        print(f"  - 重试完成: {successful_retries} 个成功, {failed_retries} 个失败。")
+        logger.info(f"  - 重试完成: {successful_retries} 个成功, {failed_retries} 个失败。")
         return successful_retries, failed_retries, still_failed
 
-    def save_undownloaded_list(self, folder: str, undownloaded_items: List[Dict]):
+    def save_undownloaded_list(self, folder: str, undownloaded_items: List[PendingImage]):
         """将未下载的图片信息列表保存到 undownloaded.json 文件中。"""
         undownloaded_path = self._get_undownloaded_filepath(folder)
         
         unique_items = []
         seen_identifiers = set()
         for item in undownloaded_items:
-            identifier = (item['url'], item['index'])
+            identifier = (item.url, item.index)
             if identifier not in seen_identifiers:
                 seen_identifiers.add(identifier)
                 unique_items.append(item)
@@ -69,55 +114,185 @@ class Downloader:
             if os.path.exists(undownloaded_path):
                 try:
                     os.remove(undownloaded_path)
-                    print("\n  - 所有图片均已成功下载，已删除 'undownloaded.json'。")
+                    logger.info("\n  - 所有图片均已成功下载，已删除 'undownloaded.json'。")
                 except OSError as e:
-                    print(f"  - 警告：删除 'undownloaded.json' 文件失败: {e}")
+                    logger.warning(f"  - 警告：删除 'undownloaded.json' 文件失败: {e}")
             return
 
-        print(f"\n  - 将 {len(unique_items)} 个未下载的图片信息保存到 'undownloaded.json'...")
+        logger.info(f"\n  - 将 {len(unique_items)} 个未下载的图片信息保存到 'undownloaded.json'...")
         try:
-            with open(undownloaded_path, 'w', encoding='utf-8') as f:
-                json.dump(unique_items, f, indent=4, ensure_ascii=False)
+            self._dump_image_list(undownloaded_path, unique_items)
         except IOError as e:
-            print(f"  - 错误：写入 'undownloaded.json' 文件失败: {e}")
+            logger.error(f"  - 错误：写入 'undownloaded.json' 文件失败: {e}")
 
 
-    def download_image(self, url: str, folder: str, pub_ts: int, id_str: str, index: int, user_name: str) -> DownloadResult:
+    def load_backfill_list(self, folder: str) -> List[PendingImage]:
+        """读取 backfill.json 中记录的、按下载策略降级或跳过的原图信息。"""
+        backfill_path = self._get_backfill_filepath(folder)
+        if not os.path.exists(backfill_path):
+            return []
+        try:
+            return self._load_image_list(backfill_path)
+        except (json.JSONDecodeError, IOError, KeyError, TypeError) as e:
+            logger.warning(f"  - 警告：读取 'backfill.json' 文件失败或格式错误: {e}")
+            return []
+
+    def save_backfill_list(self, folder: str, backfill_items: List[PendingImage], replace: bool = False):
         """
-        下载单个图片文件，增加了重试机制和用户名显示。
-        :return: "SUCCESS" (下载成功), "SKIPPED" (文件已存在), 或 "FAILED" (下载失败).
+        将需要回填原图的图片信息保存到 backfill.json 文件中。
+        :param backfill_items: 图片列表，其中 url 为原图地址。
+        :param replace: 为 True 时覆盖现有列表，否则与现有列表合并。
         """
+        backfill_path = self._get_backfill_filepath(folder)
+        existing_items = [] if replace else self.load_backfill_list(folder)
+
+        unique_items = []
+        seen_identifiers = set()
+        for item in existing_items + backfill_items:
+            identifier = (item.id_str, item.index)
+            if identifier not in seen_identifiers:
+                seen_identifiers.add(identifier)
+                unique_items.append(item)
+
+        if not unique_items:
+            if os.path.exists(backfill_path):
+                try:
+                    os.remove(backfill_path)
+                    logger.info("\n  - 所有原图均已回填，已删除 'backfill.json'。")
+                except OSError as e:
+                    logger.warning(f"  - 警告：删除 'backfill.json' 文件失败: {e}")
+            return
+
+        if not replace and len(unique_items) == len(existing_items):
+            return
+
+        try:
+            self._dump_image_list(backfill_path, unique_items)
+        except IOError as e:
+            logger.error(f"  - 错误：写入 'backfill.json' 文件失败: {e}")
+
+    def run_backfill(self, folder: str, user_name: str) -> Tuple[int, int]:
+        """
+        为 backfill.json 中记录的图片下载原图，替换本地的变体文件。
+        :return: (成功回填数, 失败回填数)
+        """
+        backfill_items = self.load_backfill_list(folder)
+        if not backfill_items:
+            return 0, 0
+
+        logger.info(f"\n  - 正在为 {user_name} 回填 {len(backfill_items)} 张原图...")
+        still_pending = []
+        successful, failed = 0, 0
+        for item in backfill_items:
+            if self.download_image(*item, overwrite=True) == "SUCCESS":
+                successful += 1
+            else:
+                failed += 1
+                still_pending.append(item)
+
+        self.save_backfill_list(folder, still_pending, replace=True)
+        logger.info(f"  - 原图回填完成: {successful} 个成功, {failed} 个失败。")
+        return successful, failed
+
+    def head_content_length(self, url: str) -> Optional[int]:
+        """
+        通过 HEAD 请求获取远程文件的大小。
+        :return: Content-Length 字节数，无法获取时返回 None。
+        """
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=15)
+            response.raise_for_status()
+            content_length = response.headers.get('Content-Length')
+            return int(content_length) if content_length else None
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+    def build_image_path(self, url: str, folder: str, pub_ts: int, id_str: str, index: int) -> str:
+        """根据图片 URL 和动态信息生成图片的本地保存路径。"""
         try:
             date_str = datetime.datetime.fromtimestamp(pub_ts).strftime('%Y-%m-%d')
         except (ValueError, OSError):
             date_str = 'unknown_date'
 
-        file_ext_match = re.search(r'\.(jpg|jpeg|png|gif|webp)', url, re.IGNORECASE)
-        file_ext = file_ext_match.group(0) if file_ext_match else '.jpg'
+        # 取最后一个匹配的扩展名，这样变体地址（例如 'xxx.jpg@1080w_85q.webp'）会使用变体的格式
+        file_ext_matches = re.findall(r'\.(?:jpg|jpeg|png|gif|webp|avif)', url, re.IGNORECASE)
+        file_ext = file_ext_matches[-1] if file_ext_matches else '.jpg'
         image_filename = f"{date_str}_{id_str}_{index}{file_ext}"
-        filepath = os.path.join(folder, image_filename)
+        return os.path.join(folder, image_filename)
 
+    def find_existing_image(self, filepath: str) -> Optional[str]:
+        """
+        查找本地已存在的图片文件。
+        除了给定路径外，还会检查同名但扩展名不同的文件（后处理可能已纠正扩展名或转换了格式）。
+        :return: 已存在文件的路径，不存在时返回 None。
+        """
         if os.path.exists(filepath):
-            # 文件已存在，返回 "SKIPPED" 状态
+            return filepath
+        stem, ext = os.path.splitext(filepath)
+        for other_ext in IMAGE_EXTENSIONS:
+            if other_ext != ext.lower() and os.path.exists(stem + other_ext):
+                return stem + other_ext
+        return None
+
+    def download_image(self, url: str, folder: str, pub_ts: int, id_str: str, index: int, user_name: str,
+                       overwrite: bool = False) -> DownloadResult:
+        """
+        下载单个图片文件，增加了重试机制和用户名显示。
+        :param overwrite: 为 True 时即使本地已存在同名图片（例如变体文件）也重新下载并替换。
+        :return: "SUCCESS" (下载成功), "SKIPPED" (文件已存在), "FAILED" (下载失败), 或 "DEFERRED" (预算已用尽).
+        """
+        filepath = self.build_image_path(url, folder, pub_ts, id_str, index)
+        image_filename = os.path.basename(filepath)
+        item = PendingImage(url, folder, pub_ts, id_str, index, user_name)
+
+        existing_path = self.find_existing_image(filepath)
+        if existing_path and not overwrite:
+            # 文件已存在，返回 "SKIPPED" 状态；尚未后处理过的旧文件也会被补充处理
+            if self.postprocessor:
+                self.postprocessor.submit(existing_path, item)
             return "SKIPPED"
 
-        green_user_name = f"\033[92m{user_name}\033[0m"
-        print(f"  -  正在下载用户 {green_user_name} 图片: {image_filename}")
+        if self.budget and not self.budget.check():
+            return "DEFERRED"
+
+        # 热路径上使用惰性格式化，日志级别被过滤时不产生字符串拼接开销
+        logger.debug("  -  正在下载用户 %s 图片: %s", user_name, image_filename,
+                     extra={"event": "download", "user": user_name, "file": image_filename})
         
         for attempt in range(3):
             try:
                 response = requests.get(url, stream=True, timeout=30)
                 response.raise_for_status()
-                with open(filepath, 'wb') as f:
+                # 先写入临时文件，完成后再替换，避免中断时留下不完整的图片
+                temp_filepath = filepath + '.part'
+                with open(temp_filepath, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=8192):
+                        if self.limiter:
+                            self.limiter.throttle(len(chunk))
+                        if self.budget:
+                            self.budget.add_bytes(len(chunk))
                         f.write(chunk)
+                os.replace(temp_filepath, filepath)
+                if self.budget:
+                    self.budget.add_image()
+                if existing_path and existing_path != filepath:
+                    # 覆盖下载时删除扩展名不同的旧文件（例如 webp 变体）
+                    os.remove(existing_path)
+                if self.postprocessor:
+                    if overwrite:
+                        self.postprocessor.invalidate(filepath)
+                    self.postprocessor.submit(filepath, item)
                 return "SUCCESS" # 下载成功
             except requests.exceptions.RequestException as e:
-                print(f"  - 下载失败: {e}")
+                logger.warning("  - 下载失败: %s", e, extra={"event": "download_error", "user": user_name,
+                                                           "file": image_filename, "attempt": attempt + 1})
                 if attempt < 2:
-                    print(f"  - 5秒后重试... (尝试 {attempt + 2}/3)")
+                    logger.info("  - 5秒后重试... (尝试 %d/3)", attempt + 2)
                     time.sleep(6)
                 else:
-                    print("  - 所有重试均失败，跳过此图片。")
-        
+                    logger.warning("  - 所有重试均失败，跳过此图片。",
+                                   extra={"event": "download_failed", "user": user_name, "file": image_filename})
+
+        if os.path.exists(filepath + '.part'):
+            os.remove(filepath + '.part')
         return "FAILED" # 所有尝试都失败了
\ No newline at end of file
@@ -6,6 +6,9 @@ import json
 from typing import List, Dict, Any, Optional
 from api import BilibiliAPI
 from config import Config
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 class FolderNameResolver:
     """负责确定用户文件夹名称的类。"""
@@ -21,7 +24,7 @@ class FolderNameResolver:
 
     def _scan_for_existing_folder(self, user_id: int) -> Optional[str]:
         """扫描输出目录，通过元数据反向查找与user_id匹配的文件夹名。"""
-        print("  - 警告：正在扫描现有文件夹以匹配用户ID... 这可能需要一些时间。")
+        logger.warning("  - 警告：正在扫描现有文件夹以匹配用户ID... 这可能需要一些时间。")
         try:
             for folder_name in os.listdir(self.base_output_dir):
                 user_folder = os.path.join(self.base_output_dir, folder_name)
@@ -38,12 +41,12 @@ class FolderNameResolver:
                             data = json.load(f)
                         uid_from_meta = data[0][-1].get('detail', {}).get('modules', {}).get('module_author', {}).get('mid')
                         if uid_from_meta and uid_from_meta == user_id:
-                            print(f"  - 匹配成功！在文件夹 '{folder_name}' 中找到了用户ID {user_id}。")
+                            logger.info(f"  - 匹配成功！在文件夹 '{folder_name}' 中找到了用户ID {user_id}。")
                             return folder_name
                     except (json.JSONDecodeError, IndexError, KeyError):
                         continue
         except Exception as e:
-            print(f"  - 扫描文件夹时出错: {e}")
+            logger.warning(f"  - 扫描文件夹时出错: {e}")
         return None
 
     def determine_folder_name(self, user_id: int, user_page_data: Optional[List[Dict]], post_urls: List[str]) -> str:
@@ -54,10 +57,10 @@ class FolderNameResolver:
         user_id_str = str(user_id)
         if user_id_str in self.config.USER_ID_TO_NAME_MAP:
             mapped_name = self.config.USER_ID_TO_NAME_MAP[user_id_str]
-            print(f"  - 在Config文件中找到高优先级映射: {user_id_str} -> {mapped_name}")
+            logger.info(f"  - 在Config文件中找到高优先级映射: {user_id_str} -> {mapped_name}")
             return self._sanitize_filename(mapped_name)
 
-        print("  - Config文件中无映射，尝试从API获取用户名...")
+        logger.info("  - Config文件中无映射，尝试从API获取用户名...")
         username = None
         if user_page_data and len(user_page_data) > 0 and len(user_page_data[0]) > 2:
             username = user_page_data[0][-1].get('username')
@@ -69,13 +72,13 @@ class FolderNameResolver:
                 username = first_post_detail.get('username') or first_post_detail.get('detail', {}).get('modules', {}).get('module_author', {}).get('name')
 
         if username:
-            print(f"  - 已通过API获取用户名: {username}")
+            logger.info(f"  - 已通过API获取用户名: {username}")
             return self._sanitize_filename(username)
 
-        print("  - 未能从API获取用户名，将尝试扫描本地文件夹...")
+        logger.info("  - 未能从API获取用户名，将尝试扫描本地文件夹...")
         folder_name = self._scan_for_existing_folder(user_id)
         if folder_name:
             return folder_name
 
-        print(f"  - 未找到任何匹配项，将使用数字ID '{user_id}' 作为文件夹名。")
+        logger.info(f"  - 未找到任何匹配项，将使用数字ID '{user_id}' 作为文件夹名。")
         return str(user_id)
\ No newline at end of file
@@ -0,0 +1,287 @@
+# processor/image_postprocessor.py
+
+import os
+import json
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from logger import get_logger
+from .records import PendingImage
+
+logger = get_logger(__name__)
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 是可选依赖，缺失时只做魔数校验
+    Image = None
+    features = None
+
+# 图片格式 -> 规范扩展名
+FORMAT_EXTENSIONS = {
+    "jpeg": ".jpg",
+    "png": ".png",
+    "gif": ".gif",
+    "webp": ".webp",
+    "avif": ".avif",
+}
+
+# 每种格式可接受的扩展名（.jpeg 与 .jpg 视为相同）
+ACCEPTED_EXTENSIONS = {
+    "jpeg": (".jpg", ".jpeg"),
+    "png": (".png",),
+    "gif": (".gif",),
+    "webp": (".webp",),
+    "avif": (".avif",),
+}
+
+RECORD_FILENAME = "postprocess.json"
+THUMBNAIL_DIRNAME = "thumbnails"
+# 转换格式并保留原始文件时，原始文件移入该子目录，避免与转换后的文件重复
+ORIGINALS_DIRNAME = "originals"
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """
+    根据文件头部的魔数判断图片的真实格式。
+    :param head: 文件开头至少 12 个字节。
+    :return: 格式名称（见 FORMAT_EXTENSIONS），无法识别时返回 None。
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "avif"
+    return None
+
+
+def _can_decode(image_format: str) -> bool:
+    """
+    判断当前安装的 Pillow 能否解码指定格式。
+    WebP/AVIF 依赖可选的编解码库（或第三方插件），未编译进 Pillow 时无法据此判断文件是否损坏。
+    """
+    if Image is None:
+        return False
+    Image.init()
+    if FORMAT_EXTENSIONS[image_format] not in Image.registered_extensions():
+        return False
+    if image_format in features.modules:
+        return bool(features.check_module(image_format))
+    return True
+
+
+def _postprocess_image(filepath: str, thumbnail_size: Optional[Tuple[int, int]],
+                       convert_format: Optional[str], keep_original: bool) -> Dict:
+    """
+    在子进程中执行的 CPU 密集型图片后处理。
+    依次进行：魔数校验与扩展名纠正、解码校验、缩略图生成、可选的格式转换。
+    无效的文件会被删除，以便下次运行时重新下载；Pillow 无法解码的格式只做魔数校验，记录为 "unverified" 并保留文件。
+    :return: 描述处理结果的字典，会被写入 postprocess.json。
+    """
+    folder = os.path.dirname(filepath)
+    stem, ext = os.path.splitext(os.path.basename(filepath))
+    result = {"file": os.path.basename(filepath), "status": "ok", "format": None,
+              "size": 0, "thumbnail": None, "error": None}
+
+    try:
+        size = os.path.getsize(filepath)
+        with open(filepath, 'rb') as f:
+            head = f.read(32)
+    except OSError as e:
+        result.update(status="error", error=str(e))
+        return result
+
+    image_format = sniff_image_format(head) if size > 0 else None
+    if image_format is None:
+        reason = "空文件" if size == 0 else "文件头不是可识别的图片格式"
+        result.update(status="invalid", error=reason)
+        _remove_quietly(filepath)
+        return result
+
+    # 扩展名与真实格式不符时重命名
+    if ext.lower() not in ACCEPTED_EXTENSIONS[image_format]:
+        corrected_path = os.path.join(folder, stem + FORMAT_EXTENSIONS[image_format])
+        try:
+            os.replace(filepath, corrected_path)
+            filepath = corrected_path
+        except OSError as e:
+            result["error"] = f"重命名失败: {e}"
+    result.update(file=os.path.basename(filepath), format=image_format, size=size)
+
+    if Image is None:
+        return result
+    if not _can_decode(image_format):
+        result.update(status="unverified", error=f"当前的 Pillow 不支持解码 {image_format}，未做解码校验")
+        return result
+
+    try:
+        with Image.open(filepath) as im:
+            im.verify()
+    except Exception as e:
+        result.update(status="invalid", error=f"解码失败: {e}")
+        _remove_quietly(filepath)
+        return result
+
+    if thumbnail_size:
+        thumbnail_dir = os.path.join(folder, THUMBNAIL_DIRNAME)
+        thumbnail_name = stem + ".jpg"
+        try:
+            os.makedirs(thumbnail_dir, exist_ok=True)
+            with Image.open(filepath) as im:
+                im.thumbnail(thumbnail_size)
+                im.convert("RGB").save(os.path.join(thumbnail_dir, thumbnail_name), "JPEG", quality=80)
+            result["thumbnail"] = os.path.join(THUMBNAIL_DIRNAME, thumbnail_name)
+        except Exception as e:
+            result["error"] = f"生成缩略图失败: {e}"
+
+    # GIF 可能是动图，为避免丢帧不做转换
+    if convert_format and convert_format != image_format and image_format != "gif":
+        converted_path = os.path.join(folder, stem + FORMAT_EXTENSIONS[convert_format])
+        try:
+            with Image.open(filepath) as im:
+                im.save(converted_path, convert_format.upper())
+            if keep_original:
+                originals_dir = os.path.join(folder, ORIGINALS_DIRNAME)
+                os.makedirs(originals_dir, exist_ok=True)
+                os.replace(filepath, os.path.join(originals_dir, os.path.basename(filepath)))
+            else:
+                os.remove(filepath)
+            result.update(file=os.path.basename(converted_path), format=convert_format,
+                          size=os.path.getsize(converted_path))
+        except Exception as e:
+            _remove_quietly(converted_path)
+            result["error"] = f"转换为 {convert_format} 失败: {e}"
+
+    return result
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ImagePostProcessor:
+    """
+    在进程池中对已下载的图片进行后处理，不阻塞网络下载流程。
+    处理结果按用户文件夹记录在 'metadata/postprocess.json' 中，已记录的图片不会被重复处理。
+    """
+
+    def __init__(self, max_workers: int, thumbnail_size: Optional[Tuple[int, int]] = None,
+                 convert_format: Optional[str] = None, keep_original: bool = False):
+        """
+        :param max_workers: 进程池的最大进程数。
+        :param thumbnail_size: 缩略图的最大宽高，为 None 时不生成缩略图。
+        :param convert_format: 重新编码的目标格式（'webp' 或 'avif'），为 None 时不转换。
+        :param keep_original: 转换格式后是否保留原始文件。
+        """
+        if convert_format and convert_format not in FORMAT_EXTENSIONS:
+            raise ValueError(f"不支持的转换格式: {convert_format}")
+        self.max_workers = max_workers
+        self.thumbnail_size = tuple(thumbnail_size) if thumbnail_size else None
+        self.convert_format = convert_format
+        self.keep_original = keep_original
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 用户文件夹 -> {文件名主干: 处理结果}
+        self._records: Dict[str, Dict[str, Dict]] = {}
+        # 用户文件夹 -> {文件名主干: (future, 下载参数)}
+        self._pending: Dict[str, Dict[str, Tuple[Future, PendingImage]]] = {}
+        # 保护进程池的惰性创建和上面两个字典，submit/invalidate/finish 可能在多个线程中调用（例如 audit --download）
+        self._lock = threading.Lock()
+
+    def _get_record_filepath(self, folder: str) -> str:
+        """获取 postprocess.json 文件的完整路径。"""
+        return os.path.join(folder, 'metadata', RECORD_FILENAME)
+
+    def _load_record(self, folder: str) -> Dict[str, Dict]:
+        """读取用户文件夹的处理记录（调用方需持有 self._lock）。"""
+        if folder not in self._records:
+            record = {}
+            record_path = self._get_record_filepath(folder)
+            if os.path.exists(record_path):
+                try:
+                    with open(record_path, 'r', encoding='utf-8') as f:
+                        record = json.load(f)
+                except (json.JSONDecodeError, IOError) as e:
+                    logger.warning(f"  - 警告：读取 '{RECORD_FILENAME}' 失败，将重新处理图片: {e}")
+                    record = {}
+            self._records[folder] = record
+        return self._records[folder]
+
+    def submit(self, filepath: str, item: PendingImage):
+        """
+        提交一张图片进行后处理。已有记录或已在处理中的图片会被忽略。
+        :param filepath: 图片文件的完整路径。
+        :param item: 下载该图片所用的参数，图片无效时将原样返回以便重新下载。
+        """
+        folder = os.path.dirname(filepath)
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        with self._lock:
+            record = self._load_record(folder)
+            pending = self._pending.setdefault(folder, {})
+            if stem in record or stem in pending:
+                return
+
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            future = self._executor.submit(_postprocess_image, filepath, self.thumbnail_size,
+                                           self.convert_format, self.keep_original)
+            pending[stem] = (future, item)
+
+    def invalidate(self, filepath: str):
+        """删除一张图片的处理记录（例如图片被原图替换后），使其可以被重新处理。"""
+        folder = os.path.dirname(filepath)
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        with self._lock:
+            self._load_record(folder).pop(stem, None)
+
+    def finish(self, folder: str) -> List[PendingImage]:
+        """
+        等待指定用户文件夹中所有已提交的后处理任务完成，并保存处理记录。
+        :return: 校验失败（已被删除）的图片列表，应加入未下载列表。
+        """
+        with self._lock:
+            pending = self._pending.pop(folder, {})
+        if not pending:
+            return []
+
+        # 在锁外等待处理结果，不阻塞其他线程提交新的图片
+        results = {}
+        invalid_items = []
+        for stem, (future, item) in pending.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"  - 警告：图片后处理进程出错 ({stem}): {e}")
+                continue
+            if result["status"] == "invalid":
+                logger.warning(f"  - 警告：图片 {result['file']} 校验失败 ({result['error']})，已删除并加入重试列表。")
+                invalid_items.append(item)
+            elif result["status"] in ("ok", "unverified"):
+                results[stem] = result
+
+        record_path = self._get_record_filepath(folder)
+        with self._lock:
+            record = self._load_record(folder)
+            record.update(results)
+            try:
+                os.makedirs(os.path.dirname(record_path), exist_ok=True)
+                with open(record_path, 'w', encoding='utf-8') as f:
+                    json.dump(record, f, indent=4, ensure_ascii=False)
+            except IOError as e:
+                logger.warning(f"  - 警告：保存 '{RECORD_FILENAME}' 失败: {e}")
+
+        logger.info(f"  - 图片后处理完成: {len(pending) - len(invalid_items)} 张通过校验, {len(invalid_items)} 张无效。")
+        return invalid_items
+
+    def shutdown(self):
+        """关闭进程池。"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
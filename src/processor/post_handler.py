@@ -2,12 +2,17 @@
 
 import os
 import datetime
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Optional
 from api import BilibiliAPI
 from config import Config
+from logger import get_logger
 from .content_extractor import ContentExtractor
+from .download_policy import DownloadPolicy
 from .downloader import Downloader
 from .metadata_saver import MetadataSaver
+from .records import PendingImage, PostRecord
+
+logger = get_logger(__name__)
 
 class PostHandler:
     """处理单个动态的完整流程。"""
@@ -19,23 +24,23 @@ class PostHandler:
         self.downloader = downloader
         self.saver = saver
 
-    def process(self, user_name: str, post_url: str, user_folder: str) -> Tuple[bool, int, List[Dict]]:
+    def process(self, user_name: str, post_url: str, user_folder: str,
+                policy: Optional[DownloadPolicy] = None) -> Tuple[bool, int, List[PendingImage], List[PendingImage]]:
         """
         处理单个动态，协调提取、保存和下载任务。
-        返回一个元组: (是否继续处理下一个动态, 成功下载的图片数, 失败下载的图片信息列表)
+        :param policy: 可选的下载策略，用于下载缩小的变体或跳过过大的原图。
+        返回一个元组: (是否继续处理下一个动态, 成功下载的图片数, 失败下载的图片列表, 需要回填原图的图片列表)
         """
         images_data = self.api.get_post_metadata(post_url)
         if not images_data or not isinstance(images_data[0][-1], dict):
-            print(f"  - 警告：未找到动态 {post_url} 的有效数据，跳过。")
-            return True, 0, []
-
-        first_image_meta = images_data[0][-1]
-        id_str = first_image_meta.get('detail', {}).get('id_str')
-        pub_ts = first_image_meta.get('detail', {}).get('modules', {}).get('module_author', {}).get('pub_ts')
+            logger.warning(f"  - 警告：未找到动态 {post_url} 的有效数据，跳过。")
+            return True, 0, [], []
 
-        if not (id_str and pub_ts):
-            print(f"  - 警告：无法从元数据中获取动态 ID 或发布时间戳，跳过。")
-            return True, 0, []
+        record = PostRecord.from_metadata(images_data)
+        if record is None:
+            logger.warning(f"  - 警告：无法从元数据中获取动态 ID 或发布时间戳，跳过。")
+            return True, 0, [], []
+        id_str, pub_ts = record.id_str, record.pub_ts
 
         try:
             date_str = datetime.datetime.fromtimestamp(pub_ts).strftime('%Y-%m-%d')
@@ -46,7 +51,7 @@ class PostHandler:
         content_json_filepath = os.path.join(user_folder, content_json_filename)
         
         if self.config.INCREMENTAL_DOWNLOAD and os.path.exists(content_json_filepath):
-            return False, 0, []
+            return False, 0, [], []
 
         # 【修改点】在保存前检查步骤2的元数据文件是否存在
         metadata_filename = f"{date_str}_{id_str}.json"
@@ -54,39 +59,53 @@ class PostHandler:
         if not os.path.exists(metadata_filepath):
             self.saver.save_step2_metadata(images_data, user_folder, date_str, pub_ts, id_str)
         else:
-            print(f"  - 步骤2元数据 '{metadata_filename}' 已存在，跳过保存。")
+            logger.debug("  - 步骤2元数据 '%s' 已存在，跳过保存。", metadata_filename)
+
+        # 原始元数据已保存到本地，下载期间只保留精简记录，避免并发处理多个动态时内存持续增长
+        del images_data
         
         successful_downloads = 0
-        failed_downloads_info: List[Dict] = []
-        total_images_to_process = len(images_data) - 1
+        failed_downloads_info: List[PendingImage] = []
+        backfill_info: List[PendingImage] = []
+        total_images_to_process = len(record.images)
         skipped_count = 0
+        policy_skipped_count = 0
+
+        for index, image_url in record.images:
+            item = PendingImage(image_url, user_folder, pub_ts, id_str, index, user_name)
+
+            # 按下载策略选择原图或变体；本地已存在的图片无需再发起 HEAD 请求
+            if policy:
+                filepath = self.downloader.build_image_path(image_url, user_folder, pub_ts, id_str, index)
+                if not self.downloader.find_existing_image(filepath):
+                    download_url = policy.select_url(image_url, self.downloader.head_content_length)
+                    if download_url != image_url:
+                        # 记录原图地址，供之后回填原图
+                        backfill_info.append(item)
+                    if download_url is None:
+                        policy_skipped_count += 1
+                        continue
+                    item = item._replace(url=download_url)
 
-        for index, image_info in enumerate(images_data[1:]):
-            if isinstance(image_info[-1], dict) and image_info[-1].get('url'):
-                image_url = image_info[-1]['url']
-                download_args = {
-                    "url": image_url,
-                    "folder": user_folder,
-                    "pub_ts": pub_ts,
-                    "id_str": id_str,
-                    "index": index + 1,
-                    "user_name": user_name
-                }
-                
-                # 【修改点】根据 download_image 的新返回值更新计数器
-                result = self.downloader.download_image(**download_args)
-                if result == "SUCCESS":
-                    successful_downloads += 1
-                elif result == "FAILED":
-                    failed_downloads_info.append(download_args)
-                elif result == "SKIPPED":
-                    skipped_count += 1
+            # 【修改点】根据 download_image 的新返回值更新计数器
+            result = self.downloader.download_image(*item)
+            if result == "SUCCESS":
+                successful_downloads += 1
+            elif result in ("FAILED", "DEFERRED"):
+                # 因预算用尽而推迟的图片同样记录下来，下次运行时重试
+                failed_downloads_info.append(item)
+            elif result == "SKIPPED":
+                skipped_count += 1
         
         if skipped_count > 0 and skipped_count == total_images_to_process:
-            print(f"  - 所有 {skipped_count} 张图片均已存在，全部跳过。")
+            logger.debug("  - 所有 %d 张图片均已存在，全部跳过。", skipped_count,
+                         extra={"event": "skip", "user": user_name, "id_str": id_str, "count": skipped_count})
         elif skipped_count > 0:
-            print(f"  - 跳过 {skipped_count} 张已存在的图片。")
+            logger.debug("  - 跳过 %d 张已存在的图片。", skipped_count,
+                         extra={"event": "skip", "user": user_name, "id_str": id_str, "count": skipped_count})
+        if policy_skipped_count > 0:
+            logger.info(f"  - 按下载策略跳过 {policy_skipped_count} 张过大的原图，已记录以便回填。")
 
         self.extractor.create_content_json_from_local_meta(user_folder, date_str, id_str)
 
-        return True, successful_downloads, failed_downloads_info
\ No newline at end of file
+        return True, successful_downloads, failed_downloads_info, backfill_info
@@ -1,14 +1,26 @@
 # processor/processor.py
 
-from typing import Dict
-from api import BilibiliAPI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from api import AsyncBilibiliAPI, BilibiliAPI
+from logger import get_logger
 from config import Config
+from .async_downloader import AsyncDownloader, aiohttp
+from .async_post_handler import AsyncPostHandler
+from .async_user_processor import AsyncUserProcessor
+from .auditor import AuditReport, FolderAuditor
 from .folder_resolver import FolderNameResolver
 from .content_extractor import ContentExtractor
+from .budget import BandwidthLimiter, RunBudget
 from .downloader import Downloader
+from .image_postprocessor import ImagePostProcessor
 from .metadata_saver import MetadataSaver
 from .post_handler import PostHandler
 from .user_processor import UserProcessor
+from .work_queue import UserWork, WorkQueue
+
+logger = get_logger(__name__)
 
 class PostProcessorFacade:
     """
@@ -18,7 +30,25 @@ class PostProcessorFacade:
     
     # 恢复：构造函数不再接收 db 实例
     def __init__(self, base_output_dir: str, api: BilibiliAPI, config: Config):
-        downloader = Downloader()
+        self.postprocessor = None
+        if config.IMAGE_POSTPROCESS:
+            self.postprocessor = ImagePostProcessor(
+                config.IMAGE_POSTPROCESS_WORKERS,
+                thumbnail_size=config.IMAGE_THUMBNAIL_SIZE,
+                convert_format=config.IMAGE_CONVERT_FORMAT,
+                keep_original=config.IMAGE_KEEP_ORIGINAL
+            )
+        limiter = None
+        if config.MAX_DOWNLOAD_BYTES_PER_SECOND:
+            limiter = BandwidthLimiter(config.MAX_DOWNLOAD_BYTES_PER_SECOND)
+        self.budget = RunBudget(
+            base_output_dir,
+            max_bytes=config.RUN_MAX_DOWNLOAD_BYTES,
+            max_images=config.RUN_MAX_DOWNLOAD_IMAGES,
+            min_free_bytes=config.MIN_FREE_DISK_BYTES,
+            max_seconds=config.RUN_TIME_BUDGET_SECONDS
+        )
+        downloader = Downloader(self.postprocessor, limiter, self.budget)
         extractor = ContentExtractor()
         saver = MetadataSaver()
         resolver = FolderNameResolver(base_output_dir, api, config)
@@ -26,9 +56,87 @@ class PostProcessorFacade:
         # 恢复：不再将 db 实例传递给 PostHandler
         post_handler = PostHandler(api, config, extractor, downloader, saver)
         self.user_processor = UserProcessor(api, resolver, saver, post_handler)
+        self.downloader = downloader
+        self.auditor = FolderAuditor(downloader, extractor)
+
+        # 异步模式下使用同一个事件循环处理所有用户，HTTP 连接池在用户之间复用
+        self._loop = None
+        self.async_downloader = None
+        if config.ASYNC_MODE:
+            if config.PRIORITY_QUEUE:
+                logger.warning("  - 警告：优先级队列模式暂不支持异步模式，将使用同步模式。")
+            elif aiohttp is None:
+                logger.warning("  - 警告：未安装 aiohttp，无法启用异步模式，将使用同步模式。")
+            else:
+                self._loop = asyncio.new_event_loop()
+                self._loop.set_default_executor(ThreadPoolExecutor(max_workers=config.ASYNC_FILE_WORKERS))
+                async_api = AsyncBilibiliAPI(api.cookie_file, config.ASYNC_MAX_GALLERY_DL)
+                self.async_downloader = AsyncDownloader(downloader, config.ASYNC_MAX_DOWNLOADS)
+                async_handler = AsyncPostHandler(async_api, config, extractor, self.async_downloader, saver)
+                self.user_processor = AsyncUserProcessor(
+                    async_api, resolver, saver, async_handler, config.ASYNC_MAX_POSTS
+                )
 
     def process_user(self, user_id: int, user_url: str) -> Dict:
         """
         启动处理单个用户的公共入口点。
         """
-        return self.user_processor.process(user_id, user_url)
\ No newline at end of file
+        if self._loop:
+            return self._loop.run_until_complete(self.user_processor.process(user_id, user_url))
+        return self.user_processor.process(user_id, user_url)
+
+    def prepare_user(self, user_id: int, user_url: str) -> Optional[UserWork]:
+        """获取用户的动态列表，生成供优先级队列调度的待办工作（包括失败重试和回填）。"""
+        return self.user_processor.prepare(user_id, user_url, load_queued=True)
+
+    def run_queue(self, works: List[UserWork]):
+        """按优先级跨用户执行所有待办工作，预算用尽时剩余的任务留在各 UserWork 中。"""
+        queue = WorkQueue()
+        for work in works:
+            queue.add_user(work)
+        queue.run(self.user_processor.run_task, self.budget)
+
+    def finalize_user(self, work: UserWork) -> Dict:
+        """保存用户剩余的工作，返回处理统计数据。"""
+        return self.user_processor.finalize(work)
+
+    def audit_folder(self, user_folder: str, repair: bool = False, download: bool = False) -> AuditReport:
+        """
+        检查单个用户文件夹的完整性。
+        :param repair: 是否修复发现的问题（删除空文件、重新生成内容JSON、把缺失图片加入 undownloaded.json）。
+        :param download: 修复后是否立即按 URL 下载 undownloaded.json 中的图片。
+        """
+        report = self.auditor.audit(user_folder)
+        if repair and report.issue_count:
+            self.auditor.repair(user_folder, report)
+        if repair and download:
+            folder_name = report.folder
+            _, _, still_failed = self.downloader.retry_undownloaded(user_folder, folder_name)
+            if self.postprocessor:
+                still_failed.extend(self.postprocessor.finish(user_folder))
+            self.downloader.save_undownloaded_list(user_folder, still_failed)
+        return report
+
+    def _cancel_pending_tasks(self):
+        """
+        取消事件循环中仍未完成的任务，并等待它们处理完取消。
+        运行被 KeyboardInterrupt 打断时，正在进行的下载任务仍处于挂起状态，
+        必须在关闭 HTTP 会话和事件循环之前结束它们，否则它们会在会话关闭期间被继续执行，或在事件循环关闭时被直接销毁。
+        """
+        tasks = asyncio.all_tasks(self._loop)
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    def close(self):
+        """释放子系统占用的资源（例如图片后处理进程池）。"""
+        if self._loop:
+            self._cancel_pending_tasks()
+            self._loop.run_until_complete(self.async_downloader.close())
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+            self._loop = None
+        if self.postprocessor:
+            self.postprocessor.shutdown()
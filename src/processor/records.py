@@ -0,0 +1,57 @@
+# processor/records.py
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+class PendingImage(NamedTuple):
+    """
+    一张待下载（或下载失败）的图片。
+    字段顺序与 Downloader.download_image 的参数一致，可以直接 download_image(*item) 调用。
+    相比字典，元组没有逐项的哈希表开销，在大量图片等待重试时占用的内存更少。
+    """
+    url: str
+    folder: str
+    pub_ts: int
+    id_str: str
+    index: int
+    user_name: str
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PendingImage':
+        """从 undownloaded.json / backfill.json 中的字典创建对象，忽略多余的字段。"""
+        return cls(*(data[field] for field in cls._fields))
+
+
+class PostRecord:
+    """
+    单个动态在下载阶段所需的最小信息。
+    gallery-dl 返回的原始元数据会在每张图片上重复完整的 'detail'，
+    保存到 step2 后即可只保留本对象并释放原始数据。
+    """
+    __slots__ = ('id_str', 'pub_ts', 'images')
+
+    def __init__(self, id_str: str, pub_ts: int, images: Tuple[Tuple[int, str], ...]):
+        """
+        :param images: (图片序号, 图片 URL) 元组。序号从 1 开始，与本地文件名中的序号一致。
+        """
+        self.id_str = id_str
+        self.pub_ts = pub_ts
+        self.images = images
+
+    @classmethod
+    def from_metadata(cls, images_data: List[List[Any]]) -> Optional['PostRecord']:
+        """
+        从 gallery-dl 返回的单个动态元数据中提取记录。
+        :return: 记录对象；缺少动态 ID 或发布时间戳时返回 None。
+        """
+        detail = images_data[0][-1].get('detail', {})
+        id_str = detail.get('id_str')
+        pub_ts = detail.get('modules', {}).get('module_author', {}).get('pub_ts')
+        if not (id_str and pub_ts):
+            return None
+
+        images = tuple(
+            (index, image_info[-1]['url'])
+            for index, image_info in enumerate(images_data[1:], start=1)
+            if isinstance(image_info[-1], dict) and image_info[-1].get('url')
+        )
+        return cls(id_str, pub_ts, images)
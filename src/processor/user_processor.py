@@ -1,12 +1,19 @@
 # processor/user_processor.py
 
 import os
-from typing import Dict, List
+import json
+from typing import Dict, List, Optional
 from tqdm import tqdm
 from api import BilibiliAPI
+from logger import SUMMARY, get_logger
+from user_folders import list_archived_post_ids
+from .download_policy import policy_for_user
 from .folder_resolver import FolderNameResolver
 from .metadata_saver import MetadataSaver
 from .post_handler import PostHandler
+from .work_queue import TIER_ARCHIVED, TIER_NEW, TIER_PENDING, TIER_RETRY, UserWork, post_sort_key
+
+logger = get_logger(__name__)
 
 class UserProcessor:
     """处理单个用户的完整流程。"""
@@ -17,66 +24,195 @@ class UserProcessor:
         self.saver = saver
         self.handler = handler
 
-    def process(self, user_id: int, user_url: str) -> Dict:
+    def _get_pending_posts_filepath(self, folder: str) -> str:
+        """获取pending_posts.json文件的完整路径。"""
+        return os.path.join(folder, 'pending_posts.json')
+
+    def _load_pending_posts(self, folder: str) -> List[str]:
+        """读取上次运行因预算用尽而未处理的动态 URL 列表。"""
+        pending_path = self._get_pending_posts_filepath(folder)
+        if not os.path.exists(pending_path):
+            return []
+        try:
+            with open(pending_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"  - 警告：读取 'pending_posts.json' 文件失败或格式错误: {e}")
+            return []
+
+    def _save_pending_posts(self, folder: str, post_urls: List[str]):
+        """保存尚未处理的动态 URL 列表；列表为空时删除文件。"""
+        pending_path = self._get_pending_posts_filepath(folder)
+        try:
+            if post_urls:
+                logger.info(f"\n  - 将 {len(post_urls)} 条未处理的动态保存到 'pending_posts.json'...")
+                with open(pending_path, 'w', encoding='utf-8') as f:
+                    json.dump(post_urls, f, indent=4, ensure_ascii=False)
+            elif os.path.exists(pending_path):
+                os.remove(pending_path)
+        except (IOError, OSError) as e:
+            logger.error(f"  - 错误：更新 'pending_posts.json' 文件失败: {e}")
+
+    def prepare(self, user_id: int, user_url: str, load_queued: bool = False) -> Optional[UserWork]:
         """
-        处理单个用户的主逻辑。
-        返回包含处理统计数据的字典。
+        获取用户的动态列表并确定文件夹，生成该用户的待办工作。
+        :param load_queued: 为 True 时同时读取 undownloaded.json（以及开启回填时的 backfill.json）作为待办任务，
+                            并把已归档的动态与新动态分开，供优先级队列统一调度。
+        :return: 待办工作；未获取到任何数据时返回 None。
         """
-        print(f"\n>>>>>>>>> 开始处理用户ID: {user_id} ({user_url}) <<<<<<<<<")
+        logger.log(SUMMARY, f"\n>>>>>>>>> 开始处理用户ID: {user_id} ({user_url}) <<<<<<<<<")
 
-        print("\n[步骤1] 正在获取所有动态的 URL...")
+        logger.info("\n[步骤1] 正在获取所有动态的 URL...")
         user_page_data = self.api.get_initial_metadata(user_url)
 
         if not user_page_data:
-            print("  - 未收到任何数据，跳过此用户。")
-            return {"processed_posts": 0, "downloaded_images": 0, "failed_images": 0, "folder_name": str(user_id)}
+            logger.info("  - 未收到任何数据，跳过此用户。")
+            return None
 
         post_urls = [item[1] for item in user_page_data if len(item) > 1]
-        total_posts = len(post_urls)
-        print(f"找到了 {total_posts} 条动态。")
+        logger.info(f"找到了 {len(post_urls)} 条动态。")
 
         folder_name = self.resolver.determine_folder_name(user_id, user_page_data, post_urls)
         user_folder = os.path.join(self.resolver.base_output_dir, folder_name)
         os.makedirs(user_folder, exist_ok=True)
-        print(f"用户识别为: '{folder_name}'")
-        print(f"文件将保存至: {user_folder}")
+        logger.info(f"用户识别为: '{folder_name}'")
+        logger.info(f"文件将保存至: {user_folder}")
 
         self.saver.save_step1_metadata(user_url, user_folder, user_page_data)
 
-        # 在处理新动态之前，重试之前失败的下载
-        successful_retries, _, persistent_failures = self.handler.downloader.retry_undownloaded(user_folder, folder_name)
-
-        green_user_name = f"\033[92m{folder_name}\033[0m"
-        print(f"\n[步骤2] 开始处理用户 {green_user_name} 的 {total_posts} 条动态...")
-        
-        processed_posts_count = 0
-        # 下载成功总数从重试成功数开始计算
-        total_successful_downloads = successful_retries
-        # 用于收集本次运行中新失败的下载
-        session_failures: List[Dict] = []
-        
-        for url in tqdm(post_urls, desc=f"处理动态", unit=" 条"):
-            should_continue, successful, new_failures = self.handler.process(folder_name, url, user_folder)
-            
-            if not should_continue:
-                green_user_name_plain = f"'{folder_name}'"
-                print(f"\n  - 增量下载模式：检测到已下载的内容，将停止处理用户 {green_user_name_plain} 的剩余动态。")
+        # 上次运行因预算用尽而未处理的动态单独记录，不与新动态混在一起
+        pending_posts = self._load_pending_posts(user_folder)
+        if pending_posts:
+            logger.info(f"  - 检测到 {len(pending_posts)} 条上次运行未处理的动态，将在本次运行中继续处理。")
+            pending_set = set(pending_posts)
+            post_urls = [url for url in post_urls if url not in pending_set]
+
+        policy = policy_for_user(self.handler.config, user_id)
+        if policy:
+            logger.info(f"  - 已为该用户启用下载策略: {policy}")
+
+        work = UserWork(user_id, folder_name, user_folder, policy, post_urls=post_urls, pending_posts=pending_posts)
+        if load_queued:
+            self._split_archived_posts(work)
+            downloader = self.handler.downloader
+            work.retries = downloader.load_undownloaded_list(user_folder)
+            if self.handler.config.RUN_FULL_QUALITY_BACKFILL:
+                work.backfills = downloader.load_backfill_list(user_folder)
+                work.manage_backfills = True
+        return work
+
+    def _split_archived_posts(self, work: UserWork):
+        """
+        把已归档的动态从新动态中分出来，避免预算被重新获取历史动态的元数据耗尽。
+        增量下载模式下与逐个用户处理时一样，遇到第一个已归档的动态就不再处理之后的动态；
+        非增量模式下已归档的动态放到最低优先级，只在空闲时重新检查。
+        """
+        archived_ids = list_archived_post_ids(work.user_folder)
+        if not archived_ids:
+            return
+        new_posts, archived_posts = [], []
+        for position, url in enumerate(work.post_urls):
+            if str(post_sort_key(url)) not in archived_ids:
+                new_posts.append(url)
+            elif self.handler.config.INCREMENTAL_DOWNLOAD:
+                logger.info(f"  - 增量下载模式：第 {position + 1} 条动态已下载，只处理之前的 {len(new_posts)} 条新动态。")
                 break
-            
-            processed_posts_count += 1
-            total_successful_downloads += successful
-            if new_failures:
-                session_failures.extend(new_failures)
-
-        # 合并本次运行失败的和之前一直失败的
-        all_failures = persistent_failures + session_failures
-        self.handler.downloader.save_undownloaded_list(user_folder, all_failures)
-        
-        total_failed_downloads = len(all_failures)
+            else:
+                archived_posts.append(url)
+        work.post_urls, work.archived_posts = new_posts, archived_posts
+        if archived_posts:
+            logger.info(f"  - 其中 {len(archived_posts)} 条动态已归档，将在其他任务完成后重新检查。")
+
+    def run_task(self, work: UserWork, tier: int, payload) -> bool:
+        """
+        执行单个任务并把结果记录到 work 中。
+        :param tier: 任务类型：TIER_NEW / TIER_PENDING / TIER_ARCHIVED（payload 为动态 URL）、
+                     TIER_RETRY 或 TIER_BACKFILL（payload 为 PendingImage）。
+        :return: 增量下载模式下新动态已被下载过时返回 False，表示不必再处理该用户的其他新动态。
+        """
+        downloader = self.handler.downloader
+        if tier in (TIER_NEW, TIER_PENDING, TIER_ARCHIVED):
+            should_continue, successful, new_failures, new_backfills = self.handler.process(
+                work.folder_name, payload, work.user_folder, work.policy)
+            if not should_continue:
+                # 上次留下的动态或已归档的动态被跳过时，不影响该用户的其他动态
+                return tier != TIER_NEW
+            work.processed_posts += 1
+            work.downloaded_images += successful
+            work.failures.extend(new_failures)
+            work.new_backfills.extend(new_backfills)
+        elif tier == TIER_RETRY:
+            result = downloader.download_image(*payload)
+            if result == "SUCCESS":
+                work.downloaded_images += 1
+            elif result in ("FAILED", "DEFERRED"):
+                work.failures.append(payload)
+        else:
+            if downloader.download_image(*payload, overwrite=True) == "SUCCESS":
+                work.downloaded_images += 1
+            else:
+                work.backfills.append(payload)
+        return True
+
+    def finalize(self, work: UserWork) -> Dict:
+        """
+        等待图片后处理完成，并保存剩余的工作：失败和未重试的图片写入 undownloaded.json，
+        未处理的动态写入 pending_posts.json，未完成的回填写回 backfill.json。
+        :return: 处理统计数据的字典。
+        """
+        downloader = self.handler.downloader
+        # 等待图片后处理完成，校验失败的图片需要重新下载
+        if downloader.postprocessor:
+            work.failures.extend(downloader.postprocessor.finish(work.user_folder))
+
+        all_failures = work.retries + work.failures
+        downloader.save_undownloaded_list(work.user_folder, all_failures)
+        self._save_pending_posts(work.user_folder, work.pending_posts + ([] if work.stopped else work.post_urls))
+        if work.manage_backfills:
+            downloader.save_backfill_list(work.user_folder, work.backfills, replace=True)
+        if work.new_backfills:
+            downloader.save_backfill_list(work.user_folder, work.new_backfills)
 
         return {
-            "processed_posts": processed_posts_count,
-            "downloaded_images": total_successful_downloads,
-            "failed_images": total_failed_downloads,
-            "folder_name": folder_name
-        }
\ No newline at end of file
+            "processed_posts": work.processed_posts,
+            "downloaded_images": work.downloaded_images,
+            "failed_images": len(all_failures),
+            "folder_name": work.folder_name
+        }
+
+    def process(self, user_id: int, user_url: str) -> Dict:
+        """
+        处理单个用户的主逻辑：先重试之前失败的下载，再按 gallery-dl 列出的顺序处理动态。
+        返回包含处理统计数据的字典。
+        """
+        work = self.prepare(user_id, user_url)
+        if work is None:
+            return {"processed_posts": 0, "downloaded_images": 0, "failed_images": 0, "folder_name": str(user_id)}
+
+        downloader = self.handler.downloader
+        # 在处理新动态之前，重试之前失败的下载
+        successful_retries, _, work.failures = downloader.retry_undownloaded(work.user_folder, work.folder_name)
+        work.downloaded_images += successful_retries
+
+        # 回填之前按下载策略降级或跳过的原图
+        if self.handler.config.RUN_FULL_QUALITY_BACKFILL:
+            successful_backfills, _ = downloader.run_backfill(work.user_folder, work.folder_name)
+            work.downloaded_images += successful_backfills
+
+        # 上次运行因预算用尽而未处理的动态排在最前面
+        post_urls = work.pending_posts + work.post_urls
+        work.pending_posts, work.post_urls = [], []
+        logger.info(f"\n[步骤2] 开始处理用户 '{work.folder_name}' 的 {len(post_urls)} 条动态...")
+
+        budget = downloader.budget
+        for position, url in enumerate(tqdm(post_urls, desc=f"处理动态", unit=" 条")):
+            if budget and not budget.check():
+                logger.log(SUMMARY, f"\n  - 预算已用尽：{budget.exhausted_reason}。将停止处理用户 '{work.folder_name}' 的剩余动态。")
+                work.post_urls = post_urls[position:]
+                break
+
+            if not self.run_task(work, TIER_NEW, url):
+                logger.log(SUMMARY, f"\n  - 增量下载模式：检测到已下载的内容，将停止处理用户 '{work.folder_name}' 的剩余动态。")
+                break
+
+        return self.finalize(work)
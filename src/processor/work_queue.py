@@ -0,0 +1,143 @@
+# processor/work_queue.py
+
+import re
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+from tqdm import tqdm
+from logger import SUMMARY, get_logger
+from .budget import RunBudget
+from .download_policy import DownloadPolicy
+from .records import PendingImage
+
+logger = get_logger(__name__)
+
+# 任务优先级，数值越小越先执行：新动态 > 上次运行留下的动态 > 重试失败的图片 > 回填原图 > 重新检查已归档的动态
+TIER_NEW = 0
+TIER_PENDING = 1
+TIER_RETRY = 2
+TIER_BACKFILL = 3
+TIER_ARCHIVED = 4
+
+# 动态 URL 末尾的数字ID，例如 https://www.bilibili.com/opus/1234567890
+POST_ID_PATTERN = re.compile(r'(\d+)\D*$')
+
+@dataclass
+class UserWork:
+    """
+    单个用户在本次运行中的待办工作和处理结果。
+    post_urls / pending_posts / retries / backfills 是尚未执行的任务，运行结束时剩余的任务会被保存，留待下次运行；
+    archived_posts 下次运行时会重新出现在动态列表中，因此不保存。
+    """
+    user_id: int
+    folder_name: str
+    user_folder: str
+    policy: Optional[DownloadPolicy]
+    # 待处理的动态 URL（优先级队列模式下只包含尚未归档的新动态）
+    post_urls: List[str] = field(default_factory=list)
+    # 上次运行因预算用尽而未处理的动态 URL（来自 pending_posts.json），不受增量下载模式提前停止的影响
+    pending_posts: List[str] = field(default_factory=list)
+    # 已归档（内容JSON已存在）的动态 URL，非增量模式下重新检查是否有遗漏的图片
+    archived_posts: List[str] = field(default_factory=list)
+    # 待重试的下载失败的图片（来自 undownloaded.json）
+    retries: List[PendingImage] = field(default_factory=list)
+    # 待回填的原图（来自 backfill.json）
+    backfills: List[PendingImage] = field(default_factory=list)
+    # 为 True 时，运行结束后用剩余的 backfills 覆盖 backfill.json
+    manage_backfills: bool = False
+    # 增量下载模式下遇到已下载的动态后，不再处理该用户的其他新动态（pending_posts 仍会处理）
+    stopped: bool = False
+    processed_posts: int = 0
+    downloaded_images: int = 0
+    failures: List[PendingImage] = field(default_factory=list)
+    new_backfills: List[PendingImage] = field(default_factory=list)
+
+
+def post_sort_key(post_url: str) -> int:
+    """
+    新动态的排序依据。Bilibili 的动态ID随发布时间递增，在获取详细元数据（pub_ts）之前即可按ID从新到旧排序。
+    :return: 动态ID，无法解析时返回 0（排在最后）。
+    """
+    match = POST_ID_PATTERN.search(post_url)
+    return int(match.group(1)) if match else 0
+
+
+class WorkQueue:
+    """
+    跨用户的优先级工作队列（基于 heapq）。
+    所有用户的新动态按动态ID从新到旧最先处理，其次是上次运行留下的动态和重试失败的图片，然后是回填原图，
+    最后才重新检查已归档的历史动态；
+    预算（包括运行时间上限）用尽后停止，剩余的任务放回各用户的 UserWork 中。
+    """
+
+    def __init__(self):
+        self._heap = []
+        # 相同优先级时按加入顺序执行，同时避免比较 UserWork 对象
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _push(self, tier: int, sort_key: int, work: UserWork, payload: Any):
+        heapq.heappush(self._heap, (tier, sort_key, next(self._counter), work, payload))
+
+    def add_user(self, work: UserWork):
+        """把一个用户的所有待办任务加入队列。"""
+        for post_url in work.post_urls:
+            self._push(TIER_NEW, -post_sort_key(post_url), work, post_url)
+        for post_url in work.pending_posts:
+            self._push(TIER_PENDING, -post_sort_key(post_url), work, post_url)
+        for item in work.retries:
+            self._push(TIER_RETRY, -item.pub_ts, work, item)
+        for item in work.backfills:
+            self._push(TIER_BACKFILL, -item.pub_ts, work, item)
+        for post_url in work.archived_posts:
+            self._push(TIER_ARCHIVED, -post_sort_key(post_url), work, post_url)
+        work.post_urls, work.pending_posts, work.retries, work.backfills, work.archived_posts = [], [], [], [], []
+
+    def run(self, run_task: Callable[[UserWork, int, Any], bool], budget: Optional[RunBudget] = None):
+        """
+        按优先级依次执行任务。
+        :param run_task: 执行单个任务的函数 (UserWork, 优先级, 任务内容) -> 是否继续处理该用户的新动态。
+        :param budget: 可选的单次运行预算，用尽后停止执行。
+        """
+        progress = tqdm(total=len(self._heap), desc="处理队列", unit=" 项")
+        try:
+            while self._heap:
+                if budget and not budget.check():
+                    logger.log(SUMMARY, f"\n  - 预算已用尽：{budget.exhausted_reason}。剩余 {len(self._heap)} 项任务将在下次运行时处理。")
+                    break
+                entry = heapq.heappop(self._heap)
+                tier, _, _, work, payload = entry
+                progress.update(1)
+                if tier == TIER_NEW and work.stopped:
+                    continue
+                try:
+                    should_continue = run_task(work, tier, payload)
+                except BaseException:
+                    # 中断时把当前任务放回队列，确保它被保存下来
+                    heapq.heappush(self._heap, entry)
+                    raise
+                if not should_continue:
+                    work.stopped = True
+                    logger.log(SUMMARY, f"\n  - 增量下载模式：检测到已下载的内容，将停止处理用户 '{work.folder_name}' 的剩余动态。")
+        finally:
+            progress.close()
+            self._drain()
+
+    def _drain(self):
+        """把未执行的任务按优先级顺序放回各用户的待办列表。"""
+        while self._heap:
+            tier, _, _, work, payload = heapq.heappop(self._heap)
+            if tier == TIER_NEW:
+                if not work.stopped:
+                    work.post_urls.append(payload)
+            elif tier == TIER_PENDING:
+                work.pending_posts.append(payload)
+            elif tier == TIER_RETRY:
+                work.retries.append(payload)
+            elif tier == TIER_BACKFILL:
+                work.backfills.append(payload)
+            else:
+                work.archived_posts.append(payload)
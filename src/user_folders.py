@@ -0,0 +1,89 @@
+# user_folders.py
+
+import os
+import re
+import json
+from typing import Dict, List, Optional, Set
+
+# 最终内容 JSON 文件，例如 2024-01-31_912345678901234567.json
+CONTENT_FILE_PATTERN = re.compile(r'^((?:\d{4}-\d{2}-\d{2}|unknown_date)_(\d+))\.json$')
+# 图片文件，例如 2024-01-31_912345678901234567_3.jpg
+IMAGE_FILE_PATTERN = re.compile(r'^((?:\d{4}-\d{2}-\d{2}|unknown_date)_\d+)_(\d+)\.(?:jpg|jpeg|png|gif|webp|avif)$', re.IGNORECASE)
+# 步骤1元数据文件名由用户主页 URL 生成，例如 space_bilibili_com_35117822_article.json
+STEP1_FILE_PATTERN = re.compile(r'^space_bilibili_com_(\d+)_')
+
+
+def list_user_folders(base_output_dir: str) -> List[str]:
+    """
+    列出输出目录中所有的用户文件夹名称：包含 metadata/step2 目录或内容 JSON 的文件夹。
+    导出目录、锁目录等不满足该条件，会被自动排除。
+    """
+    folders = []
+    for entry in os.scandir(base_output_dir):
+        if not entry.is_dir():
+            continue
+        if os.path.isdir(os.path.join(entry.path, 'metadata', 'step2')):
+            folders.append(entry.name)
+            continue
+        with os.scandir(entry.path) as it:
+            if any(CONTENT_FILE_PATTERN.match(child.name) for child in it):
+                folders.append(entry.name)
+    return sorted(folders)
+
+
+def list_archived_post_ids(user_folder: str) -> Set[str]:
+    """
+    列出用户文件夹中已归档的动态ID，即已经生成内容 JSON 的动态（内容 JSON 在图片下载完成后才生成）。
+    只有步骤2元数据而没有内容 JSON 的动态上次处理时被中断，不计入其中。
+    """
+    if not os.path.isdir(user_folder):
+        return set()
+    post_ids = set()
+    with os.scandir(user_folder) as it:
+        for entry in it:
+            match = CONTENT_FILE_PATTERN.match(entry.name)
+            if match:
+                post_ids.add(match.group(2))
+    return post_ids
+
+
+def resolve_user_folder(base_output_dir: str, user_id_to_name_map: Dict[str, str], user: str) -> Optional[str]:
+    """根据文件夹名称或用户数字ID（通过 USER_ID_TO_NAME_MAP）查找用户文件夹。"""
+    candidates = [user, user_id_to_name_map.get(user)]
+    for candidate in candidates:
+        if candidate and os.path.isdir(os.path.join(base_output_dir, candidate)):
+            return candidate
+    return None
+
+
+def find_user_id(base_output_dir: str, folder: str, user_id_to_name_map: Dict[str, str]) -> Optional[str]:
+    """
+    查找用户文件夹对应的用户数字ID，依次尝试：USER_ID_TO_NAME_MAP 反查 -> 步骤1元数据文件名 -> 步骤2元数据中的作者ID。
+    :return: 字符串形式的用户ID，无法确定时返回 None。
+    """
+    for user_id, name in user_id_to_name_map.items():
+        if name == folder:
+            return user_id
+
+    user_folder = os.path.join(base_output_dir, folder)
+    step1_dir = os.path.join(user_folder, 'metadata', 'step1')
+    if os.path.isdir(step1_dir):
+        for name in os.listdir(step1_dir):
+            match = STEP1_FILE_PATTERN.match(name)
+            if match:
+                return match.group(1)
+
+    step2_dir = os.path.join(user_folder, 'metadata', 'step2')
+    if os.path.isdir(step2_dir):
+        for name in os.listdir(step2_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(step2_dir, name), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                mid = data[0][-1].get('detail', {}).get('modules', {}).get('module_author', {}).get('mid')
+            except (OSError, json.JSONDecodeError, IndexError, KeyError, TypeError, AttributeError):
+                continue
+            if mid:
+                return str(mid)
+    return None